@@ -1,7 +1,10 @@
 """
 ARCGIS
 """
-import arcpy
+import time
+import instrument
+from lazy_import import arcpy
+from table_backend import TableBackend, get_backend
 
 def reset_stats_fields(table, field_list: list = None, rep_alias: bool = True) -> None:
     '''
@@ -23,36 +26,93 @@ def reset_stats_fields(table, field_list: list = None, rep_alias: bool = True) -
             else:
                 arcpy.management.AlterField(in_table = table, field = field, new_field_name = field_rep)
 
-def selection_count(table) -> int:
+def selection_count(table, backend: TableBackend = None) -> int:
     '''
     Returns a count of the number of records selected in a table.
     Returns -1 if all records in a table are selected.
     `Table`: Table with records to be counted.
+    `backend`: `TableBackend` used to access the table. Default: None, `table_backend.get_backend()`.
     '''
-    if arcpy.Describe(table).FIDSet:
-        records = arcpy.GetCount_management(table)
-        count = int(records.getOutput(0))
-        if count == int(arcpy.management.GetCount(table)[0]):
-            return -1
-        else:
-            return count
-    else:
-        return 0
+    if backend is None:
+        backend = get_backend()
+    return backend.selection_count(table)
+
+def join_update(from_table, to_table, from_fields: list, to_fields: list, from_key: str, to_key: str = None, unique: bool = False, chunk_size: int = None, backend: TableBackend = None) -> int:
+    '''
+    Updates records in one table with values from the records in another table that have the same key (a hash join).
+    The key and field values of `from_table` are read once into a dictionary, then every record of `to_table` is updated in a single cursor pass. Records in `to_table` without a matching key are left unchanged.
+    Returns the number of records updated.
+    `from_table`: Table that attributes will be pulled from.
+    `to_table`: Table that will have its records updated.
+    `from_fields`: Fields in `from_table` to copy.
+    `to_fields`: Fields in `to_table` to copy to, in the same order as `from_fields`.
+    `from_key`: Key field in `from_table`.
+    `to_key`: Key field in `to_table`. Default: None, same as `from_key`.
+    `unique`: If keys in `from_table` must be unique. If False and a key is repeated, the last record with the key is used. Default: False.
+    `chunk_size`: Maximum number of `from_table` records held in memory at once. Each chunk takes one pass over `to_table`, so tables larger than memory can be joined. With chunks, `unique` is only checked within each chunk. Default: None, no limit.
+    `backend`: `TableBackend` used to access the tables. Default: None, `table_backend.get_backend()`.
+    '''
+    if backend is None:
+        backend = get_backend()
+    if to_key is None:
+        to_key = from_key
+    start_time = time.perf_counter()
+    updated = 0
+    read = 0
+    chunks = 0
+    with backend.search_cursor(from_table, [from_key] + list(from_fields)) as search_cursor:
+        while True:
+            #Build hash index of key -> values
+            index = {}
+            for row in search_cursor:
+                read += 1
+                if row[0] is None:
+                    continue
+                if unique is True and row[0] in index:
+                    raise Exception(f'Key {row[0]} is repeated in the input table, but unique keys were required.')
+                index[row[0]] = row[1:]
+                if chunk_size is not None and len(index) >= chunk_size:
+                    break
+            if not index:
+                break
+
+            ##Update matching records in one pass
+            with backend.update_cursor(to_table, [to_key] + list(to_fields)) as update_cursor:
+                for row_to in update_cursor:
+                    values = index.get(row_to[0])
+                    if values is not None:
+                        update_cursor.updateRow([row_to[0], *values])
+                        updated += 1
+            chunks += 1
+            if chunk_size is None or len(index) < chunk_size:
+                break
+    instrument.emit('table.join_update', rows_read=read, rows_updated=updated, passes=chunks, seconds=time.perf_counter() - start_time)
+    return updated
 
-def update_records_from(from_table, to_table, fields: list|dict, method: str):
+def update_records_from(from_table, to_table, fields: list|dict, method: str, key_field: str|tuple = None, chunk_size: int = None, backend: TableBackend = None) -> int:
     '''
     Updates attributes from one table using values from another.
+    Returns the number of records updated.
     `from_table`: Table that attributes will be pulled from.
     `to_table`: Table that will have its records updated.
-    `fields`: Fields that will be updated/used to update records. If a list is used, the fields will be used in both tables. If a dictionary is used, fields will be mapped as key, value pairs. If only one field is used, it may be input as a list or string.
+    `fields`: Fields that will be updated/used to update records. If a list is used, the fields will be used in both tables. If a dictionary is used, fields will be mapped as key, value pairs. If only one field is used, it may be input as a list or string. If `'*'`, an empty list or an empty dictionary is used, all editable fields found in both tables are used.
     `Method`: Method used to update records.
-        `1:1`: One-to-one, matches each record in the input table to a record in the output table. The order of records in each table is used to determine match order.
-        `1:m`: One-to-many, matches one selected record from the in table to multiple in the out table.
+        `1:1`: One-to-one, matches each record in the input table to a record in the output table. If `key_field` is provided, records are matched by key and keys must be unique in the input table. Otherwise the order of records in each table is used to determine match order.
+        `1:m`: One-to-many, matches one selected record from the in table to multiple in the out table. Exactly one record must be selected in the in table.
+        `m:m`: Many-to-many, matches records by `key_field`. Each record in the out table is updated from the record in the in table with the same key. If a key is repeated in the in table, the last record is used.
+    `key_field`: Field used to match records. A tuple can be used for different field names: (in table field, out table field). Required for `m:m`. Default: None.
+    `chunk_size`: Maximum number of records from the input table held in memory when matching by key. See `join_update`. Default: None.
+    `backend`: `TableBackend` used to access the tables. Default: None, `table_backend.get_backend()`.
     '''
+    if backend is None:
+        backend = get_backend()
+
     #Assign fields to list variables
-    if fields is any([],{},'*'):
-        from_list = '*'
-        to_list = '*'
+    if fields in ('*', [], {}):
+        to_fields = backend.fields(to_table)
+        keys = key_field if isinstance(key_field, tuple) else (key_field, key_field)
+        from_list = [field for field in backend.fields(from_table) if field in to_fields and field not in keys]
+        to_list = from_list
     elif isinstance(fields, list):
         from_list = fields
         to_list = fields
@@ -63,22 +123,40 @@ def update_records_from(from_table, to_table, fields: list|dict, method: str):
         from_list = [fields]
         to_list = [fields]
 
+    #Keyed Methods
+    if method in ('1:1', 'm:m') and key_field is not None:
+        from_key, to_key = key_field if isinstance(key_field, tuple) else (key_field, key_field)
+        return join_update(from_table, to_table, from_list, to_list, from_key, to_key, unique=(method == '1:1'), chunk_size=chunk_size, backend=backend)
+
     #Methods
+    start_time = time.perf_counter()
     if method == '1:1':
-        if selection_count(from_table) != selection_count(to_table):
+        if backend.get_count(from_table) != backend.get_count(to_table):
             raise Exception('Number of records selected in input table is not equal to number selected in output table, but 1:1 relationship specified.')
-        raise NotImplementedError()
+        updated = 0
+        with backend.search_cursor(from_table, from_list) as search_cursor, backend.update_cursor(to_table, to_list) as update_cursor:
+            for row_from, row_to in zip(search_cursor, update_cursor):
+                update_cursor.updateRow(list(row_from))
+                updated += 1
+        instrument.emit('table.update_records', method=method, rows_updated=updated, seconds=time.perf_counter() - start_time)
+        return updated
 
     elif method == '1:m':
-        if selection_count(from_table) > 1:
-            raise Exception('More than 1 record selected in input table, but 1:m relationship specified.')
-        with arcpy.da.SearchCursor(from_table, from_list) as search_cursor:
+        #selection_count is -1 when every record is selected, so the selected IDs are counted instead
+        if len(backend.selection_ids(from_table) or ()) != 1:
+            raise Exception('Exactly 1 record must be selected in input table when 1:m relationship specified.')
+        with backend.search_cursor(from_table, from_list) as search_cursor:
             row_from = next(search_cursor)
-            value_from = row_from[0]
-        with arcpy.da.UpdateCursor(to_table, to_list) as update_cursor:
+        updated = 0
+        with backend.update_cursor(to_table, to_list) as update_cursor:
             for row_to in update_cursor:
-                # Set the value in Table B to the value from Table A
-                row_to[0] = value_from
-                update_cursor.updateRow(row_to)
+                # Set the values in Table B to the values from Table A
+                update_cursor.updateRow(list(row_from))
+                updated += 1
+        instrument.emit('table.update_records', method=method, rows_updated=updated, seconds=time.perf_counter() - start_time)
+        return updated
+
+    elif method == 'm:m':
+        raise ValueError('key_field must be provided for the "m:m" method.')
     else:
-        raise ValueError(f'{method} is not a valid value for "method". Valid values are: "1:1" and "1:m".')
\ No newline at end of file
+        raise ValueError(f'{method} is not a valid value for "method". Valid values are: "1:1", "1:m" and "m:m".')
@@ -1,92 +1,384 @@
+import json
+import threading
+import time
 import warnings
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import instrument
 
 PORTAL_ITEM_TYPES = ['360 VR Experience','CityEngine Web Scene','Map Area','Pro Map','Web Map','Web Scene','Feature Collection','Feature Collection Template','Feature Service','Geodata Service','Group Layer','Image Service','KML','KML Collection','Map Service','OGCFeatureServer','Oriented Imagery Catalog','Relational Database Connection','3DTilesService','Scene Service','Vector Tile Service','WFS','WMS','WMTS','Geometry Service','Geocoding Service','Geoprocessing Service','Network Analysis Service','Workflow Manager Service','AppBuilder Extension','AppBuilder Widget Package','Code Attachment','Dashboard','Data Pipeline','Deep Learning Studio Project','Esri Classification Schema','Excalibur Imagery Project','Experience Builder Widget','Experience Builder Widget Package','Form','GeoBIM Application','GeoBIM Project','Hub Event','Hub Initiative','Hub Initiative Template','Hub Page','Hub Project','Hub Site Application','Insights Workbook','Insights Workbook Package','Insights Model','Insights Page','Insights Theme','Insights Data Engineering Workbook','Insights Data Engineering Model','Investigation','Knowledge Studio Project','Mission','Mobile Application','Notebook','Notebook Code Snippet Library','Native Application','Native Application Installer','Ortho Mapping Project','Ortho Mapping Template','Solution','StoryMap','Web AppBuilder Widget','Web Experience','Web Experience Template','Web Mapping Application','Workforce Project','Administrative Report','Apache Parquet','CAD Drawing','Color Set','Content Category Set','CSV','Document Link','Earth configuration','Esri Classifier Definition','Export Package','File Geodatabase','GeoJson','GeoPackage','GML','Image','iWork Keynote','iWork Numbers','iWork Pages','Microsoft Excel','Microsoft Powerpoint','Microsoft Word','PDF','Report Template','Service Definition','Shapefile','SQLite Geodatabase','Statistical Data Collection','StoryMap Theme','Style','Symbol Set','Visio Document','ArcPad Package','Compact Tile Package','Explorer Map','Globe Document','Layout','Map Document','Map Package','Map Template','Mobile Basemap Package','Mobile Map Package','Mobile Scene Package','Project Package','Project Template','Published Map','Scene Document','Task File','Tile Package','Vector Tile Package','Explorer Layer','Image Collection','Layer','Layer Package','Pro Report','Scene Package','3DTilesPackage','Desktop Style','ArcGIS Pro Configuration','Deep Learning Package','Geoprocessing Package','Geoprocessing Package (Pro version)','Geoprocessing Sample','Locator Package','Raster function template','Rule Package','Pro Report Template','ArcGIS Pro Add In','Code Sample','Desktop Add In','Desktop Application','Desktop Application Template','Explorer Add In','Survey123 Add In','Workflow Manager Package']
 
-def portal_query_type(gis, filter_type: str = '' ,type_filter: list = []):
+#Portal searches do not return results past the first 10,000
+PORTAL_SEARCH_LIMIT = 10000
+
+def _search_count(gis, query: str) -> int:
+    with instrument.timed('portal.search', query=query, kind='count') as event:
+        count = gis.content.advanced_search(query=query, return_count=True)
+        event['items'] = count
+    return count
+
+def _search_page(gis, query: str, start: int, num: int) -> list:
+    with instrument.timed('portal.search', query=query, kind='page', start=start) as event:
+        results = gis.content.advanced_search(query=query, start=start, max_items=num, sort_field='created', sort_order='asc')['results']
+        event['items'] = len(results)
+    return results
+
+def portal_search_all(gis, query: str, shard_types: list = None, max_workers: int = 8, page_size: int = 100, stats: dict = None) -> list:
+    '''
+    Returns every portal item matching a search query, sorted by item ID.
+    Results are paged with `start`/`num` offsets. Portal searches only return the first 10,000 results, so larger queries are split into one shard per owner, and owners with more than 10,000 items are split again by item type. Counts and pages are requested concurrently and items returned by more than one shard are only included once.
+    `gis`: `arcgis.gis.GIS` object.
+    `query`: Portal search query.
+    `shard_types`: Item types used to split owners with more than 10,000 items.
+        Default: `None`, all of `PORTAL_ITEM_TYPES`.
+    `max_workers`: Maximum number of searches run at the same time.
+        Default: `8`
+    `page_size`: Number of items requested per page (at most 100).
+        Default: `100`
+    `stats`: Dictionary updated with the number of shards, truncated shards, searches, items, duplicates, missed items (items counted by a search but not covered by its shards) and the seconds taken.
+        Default: `None`
+    '''
+    start_time = time.perf_counter()
+    searches = 0
+    if shard_types is None:
+        shard_types = PORTAL_ITEM_TYPES
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        #Split the query into shards under the search limit
+        total = _search_count(gis, query)
+        shards = [(query, total)]
+        searches += 1
+        missed = 0
+        if total > PORTAL_SEARCH_LIMIT:
+            users = gis.users.search(max_users=10000)
+            searches += 1
+            queries = [f'({query}) AND owner:"{user.username}"' for user in users]
+            shards = list(zip(queries, executor.map(lambda shard_query: _search_count(gis, shard_query), queries)))
+            searches += len(queries)
+            owner_total = sum(count for _, count in shards)
+            if owner_total < total:
+                warnings.warn(f'Only {owner_total} of {total} items for {query} are owned by users returned by gis.users.search. Items of other owners were not queried.')
+                missed += total - owner_total
+        oversized = [(shard_query, count) for shard_query, count in shards if count > PORTAL_SEARCH_LIMIT]
+        shards = [(shard_query, count) for shard_query, count in shards if 0 < count <= PORTAL_SEARCH_LIMIT]
+        truncated = 0
+        for shard_query, count in oversized:
+            queries = [f'{shard_query} AND type:"{item_type}"' for item_type in shard_types]
+            type_counts = list(executor.map(lambda type_query: _search_count(gis, type_query), queries))
+            searches += len(queries)
+            if sum(type_counts) < count:
+                warnings.warn(f'Only {sum(type_counts)} of {count} items for {shard_query} have a type in shard_types. Other items were not queried.')
+                missed += count - sum(type_counts)
+            for type_query, type_count in zip(queries, type_counts):
+                if type_count > PORTAL_SEARCH_LIMIT:
+                    warnings.warn(f'{type_query} returns {type_count} items. Only the first {PORTAL_SEARCH_LIMIT} can be queried.')
+                    truncated += 1
+                    missed += type_count - PORTAL_SEARCH_LIMIT
+                if type_count > 0:
+                    shards.append((type_query, min(type_count, PORTAL_SEARCH_LIMIT)))
+
+        #Request every page of every shard
+        pages = [(shard_query, start, min(page_size, count - start + 1)) for shard_query, count in shards for start in range(1, count + 1, page_size)]
+        results = executor.map(lambda page: _search_page(gis, *page), pages)
+        items = {}
+        returned = 0
+        for page_items in results:
+            returned += len(page_items)
+            for item in page_items:
+                items.setdefault(item.id, item)
+        searches += len(pages)
+
+    search_stats = {'shards': len(shards), 'truncated_shards': truncated, 'searches': searches, 'items': len(items),
+                    'duplicates': returned - len(items), 'missed_items': missed, 'seconds': time.perf_counter() - start_time}
+    if stats is not None:
+        stats.update(search_stats)
+    instrument.emit('portal.search_all', query=query, **search_stats)
+    return [items[item_id] for item_id in sorted(items)]
+
+def portal_query_type(gis, filter_type: str = '', type_filter: list = None, max_workers: int = 8, stats: dict = None) -> list:
+    '''
+    Returns all portal items not owned by Esri accounts, optionally filtered by item type. See `portal_search_all` for how searches over 10,000 items are split.
+    `gis`: `arcgis.gis.GIS` object.
+    `filter_type`: How `type_filter` is applied.
+        Accepted Values: `'Include'`, `'Exclude'`, `''`
+        Default: `''`
+    `type_filter`: List of item types (from `PORTAL_ITEM_TYPES`) to include or exclude.
+        Default: `None`
+    `max_workers`: Maximum number of searches run at the same time.
+        Default: `8`
+    `stats`: Dictionary updated with search statistics. See `portal_search_all`.
+        Default: `None`
+    '''
     #Check filter against item type list
+    type_filter = list(type_filter or [])
     if filter_type == 'Exclude':
-        type_filter[:] = [i for i in PORTAL_ITEM_TYPES if i not in type_filter]
+        type_filter = [i for i in PORTAL_ITEM_TYPES if i not in type_filter]
     elif filter_type == 'Include':
-        type_filter[:] = [i for i in PORTAL_ITEM_TYPES if i in type_filter]
+        type_filter = [i for i in PORTAL_ITEM_TYPES if i in type_filter]
     elif filter_type == '' or type_filter == []:
         pass
     else:
         raise Exception(f'Correct filter type not specified. Exclude, Include, or an empty string are the only accepted inputs. Your input: {filter_type}.')
-    
-    #Try regular search
-    ##If over 500, search by user
-    ##If user has over 500, try to search by item type and user
+
     if type_filter != []:
         query = '" OR "'.join(type_filter)
-        query = f'type: ("{query}")'
-        items = gis.content.search(query=f'{query}, NOT owner: esri*', max_items=500)
+        query = f'type:("{query}") AND NOT owner:esri*'
     else:
-        items = gis.content.search(query='NOT owner:esri*', max_items=500) 
-
-    if len(items) == 500:
-        items.clear()
-        users = gis.users.search(max_users = 10000)
-        users = [user for user in users if user.storageUsage != 0]
-        for user in users:
-            if type_filter != []:
-                items_by_user = gis.content.search(query=f'{query}, owner: {user.username}', outside_org=False, max_items=500)
-            else:
-                items_by_user = gis.content.search(query=f'owner: {user.username}', outside_org=False, max_items=500)
-            
-            if not items_by_user:
-                pass
-            elif len(items_by_user) < 500:
-                items.extend(items_by_user)
-            elif len(items_by_user) != 500:
-                for item_type in type_filter:
-                    items_by_type = gis.content.search(query=f'type: {item_type} AND owner: {user.username}',  outside_org=False, max_items=500)
-                    if len(items_by_type) == 0:
-                        pass
-                    if len(items_by_type) == 500:                
-                        warnings.warn(f'{user.username} has over 500 portal items of a single type. Unable to query all {item_type} items. Items currently queried added to content list.')
-                        items.extend(items_by_type)
-                    else:
-                        items.extend(items_by_type)
-            else:
-                Exception('More than 500 items returned. Please update script with new max_items arguement.')
-    elif len(items) == 0:
-        raise Exception('No items returned with the function gis.content.search.')
+        query = 'NOT owner:esri*'
+
+    items = portal_search_all(gis, query, shard_types=type_filter or None, max_workers=max_workers, stats=stats)
+    if len(items) == 0:
+        raise Exception('No items returned with the function gis.content.advanced_search.')
     return items
 
+def normalize_tag(tag: str) -> str:
+    '''
+    Returns a tag in lower case with surrounding whitespace removed and inner whitespace collapsed to single spaces, so variants like `'Water Quality'` and `' water  quality'` group together.
+    `tag`: Tag to normalize.
+    '''
+    return ' '.join(tag.split()).casefold()
+
+class TagIndex:
+    '''
+    Inverted index of portal item tags: tag to item IDs and item ID to tags.
+    Built once from the items returned by `portal_query_type`, it answers tag counts and "items with tag X" lookups without scanning every item, and can be refreshed with only the items that changed.
+    `items`: Portal items to index.
+        Default: `None`
+    '''
+    def __init__(self, items: list = None):
+        self.item_tags = {}
+        self.tag_items = {}
+        self._modified = {}
+        #Normalized tag -> tags that normalize to it, kept up to date as tags are added and removed
+        self._groups = {}
+        if items is not None:
+            self.refresh(items)
+
+    def _remove(self, item_id: str) -> None:
+        for tag in self.item_tags.pop(item_id, ()):
+            item_ids = self.tag_items[tag]
+            item_ids.discard(item_id)
+            if not item_ids:
+                del self.tag_items[tag]
+                normalized = normalize_tag(tag)
+                variants = self._groups[normalized]
+                variants.discard(tag)
+                if not variants:
+                    del self._groups[normalized]
+        self._modified.pop(item_id, None)
+
+    def _add(self, item_id: str, tags: list, modified = None) -> None:
+        tags = tuple(dict.fromkeys(tags))
+        self.item_tags[item_id] = tags
+        self._modified[item_id] = modified
+        for tag in tags:
+            if tag not in self.tag_items:
+                self.tag_items[tag] = set()
+                self._groups.setdefault(normalize_tag(tag), set()).add(tag)
+            self.tag_items[tag].add(item_id)
+
+    def refresh(self, items: list) -> int:
+        '''
+        Adds items to the index, or re-indexes them if they are already indexed. Items whose `modified` time is unchanged since they were indexed are skipped.
+        Returns the number of items indexed.
+        `items`: Portal items to index.
+        '''
+        indexed = 0
+        for item in items:
+            modified = getattr(item, 'modified', None)
+            if item.id in self.item_tags and modified is not None and self._modified.get(item.id) == modified:
+                continue
+            self._remove(item.id)
+            self._add(item.id, item.tags, modified)
+            indexed += 1
+        return indexed
+
+    def remove(self, item_ids: list|str) -> None:
+        '''
+        Removes items from the index.
+        `item_ids`: List of item IDs. A string can also be used for a single item.
+        '''
+        if isinstance(item_ids, str):
+            item_ids = [item_ids]
+        for item_id in item_ids:
+            self._remove(item_id)
+
+    def __len__(self) -> int:
+        return len(self.item_tags)
+
+    def items_with(self, tag: str, normalize: bool = False) -> set:
+        '''
+        Returns the IDs of items with a tag.
+        `tag`: Tag to search for.
+        `normalize`: Whether to match every tag that normalizes to the same value (see `normalize_tag`).
+            Default: `False`
+        '''
+        if normalize is False:
+            return set(self.tag_items.get(tag, ()))
+        return self._group_items(self._groups.get(normalize_tag(tag), ()))
+
+    def _group_items(self, variants) -> set:
+        item_ids = set()
+        for variant in variants:
+            item_ids.update(self.tag_items[variant])
+        return item_ids
+
+    def items_with_any(self, tags) -> set:
+        '''
+        Returns the IDs of items with at least one of the tags.
+        `tags`: Iterable of tags.
+        '''
+        item_ids = set()
+        for tag in tags:
+            item_ids.update(self.tag_items.get(tag, ()))
+        return item_ids
+
+    def counts(self, normalize: bool = False) -> Counter:
+        '''
+        Returns a `Counter` of the number of items with each tag.
+        `normalize`: Whether to count tags that normalize to the same value together (see `normalize_tag`).
+            Default: `False`
+        '''
+        if normalize is False:
+            return Counter({tag: len(item_ids) for tag, item_ids in self.tag_items.items()})
+        return Counter({normalized: len(self._group_items(variants)) for normalized, variants in self._groups.items()})
+
+    def groups(self) -> dict:
+        '''
+        Returns a dictionary of normalized tags and the set of tags that normalize to each of them.
+        '''
+        return {normalized: set(variants) for normalized, variants in self._groups.items()}
+
+    def save(self, path: str) -> None:
+        '''
+        Saves the index to a JSON file.
+        `path`: Output file path.
+        '''
+        data = {item_id: {'tags': list(tags), 'modified': self._modified.get(item_id)} for item_id, tags in self.item_tags.items()}
+        with open(path, 'w', encoding='utf-8') as index_file:
+            json.dump(data, index_file)
+
+    @classmethod
+    def load(cls, path: str):
+        '''
+        Loads an index saved with `save`.
+        `path`: File path.
+        '''
+        index = cls()
+        with open(path, encoding='utf-8') as index_file:
+            for item_id, entry in json.load(index_file).items():
+                index._add(item_id, entry['tags'], entry['modified'])
+        return index
+
 def portal_tag_list(items) -> dict:
-    tag_list = []
-    for item in items:
-        for tag in item.tags:
-            tag_list.append(tag)
+    '''
+    Returns a dictionary of each tag used by portal items and the number of items using it. An item listing a tag more than once is counted once.
+    `items`: Portal items, or a `TagIndex`.
+    '''
+    with instrument.timed('portal.tag_list', indexed=isinstance(items, TagIndex)) as event:
+        if isinstance(items, TagIndex):
+            tag_counts = items.counts()
+        else:
+            tag_counts = Counter(tag for item in items for tag in dict.fromkeys(item.tags))
+        event['tags'] = len(tag_counts)
     tag_dict = {'Tag Name':[],'Count':[]}
-    tag_values = set(tag_list)
-    for value in tag_values:
-        count = len([tag for tag in tag_list if tag == value])
+    for value, count in tag_counts.items():
         tag_dict['Count'].append(count)
         if value == '':
             value = '<No Tags>'
         tag_dict['Tag Name'].append(value)
     return tag_dict
 
-def portal_tag_update(items, tag_mapping, update: bool = False, gis = 'N/A'):
-    tag_dict = {'Item ID':[], 'Old Tags':[],'New Tags':[]}
+def _update_item_tags(item, tags: list, retries: int, backoff: float) -> str:
+    for attempt in range(retries + 1):
+        try:
+            with instrument.timed('portal.item_update', item_id=item.id, attempt=attempt) as event:
+                event['updated'] = bool(item.update(item_properties={'tags': tags}))
+            if event['updated']:
+                return 'Updated'
+            error = 'update returned False'
+        except Exception as exception:
+            error = f'{type(exception).__name__}: {exception}'
+        if attempt < retries:
+            time.sleep(backoff * 2 ** attempt)
+    return f'Failed ({error})'
+
+def portal_tag_update(items, tag_mapping, update: bool = False, gis = 'N/A', index: TagIndex = None, max_workers: int = 8, retries: int = 3, backoff: float = 1, journal: str = None) -> dict:
+    '''
+    Maps the tags of portal items to new values and optionally updates the items.
+    Returns a dictionary with the item ID, old tags, new tags (`None` if unchanged) and update status of each item.
+    `items`: Portal items, such as those returned by `portal_query_type`.
+    `tag_mapping`: Dictionary of old tags and their replacements. Tags mapped to `''` are removed.
+    `update`: Whether to update items whose tags changed. Only items with a change are updated, using the item objects in `items`.
+        Default: `False`
+    `gis`: Not needed, as items are updated directly. Kept for compatibility.
+        Default: `'N/A'`
+    `index`: `TagIndex` of `items`. If provided, only items with a mapped tag are examined, and the index is refreshed with the updated items.
+        Default: `None`
+    `max_workers`: Maximum number of items updated at the same time.
+        Default: `8`
+    `retries`: Number of times a failed update is retried.
+        Default: `3`
+    `backoff`: Seconds to wait before the first retry, doubled for each following retry.
+        Default: `1`
+    `journal`: Path of a file logging each updated item. Items already in the journal are skipped, so an interrupted run can be resumed by running it again with the same journal.
+        Default: `None`
+    '''
+    tag_dict = {'Item ID':[], 'Old Tags':[],'New Tags':[], 'Status':[]}
+    #Only items with a mapped tag can change
+    if index is not None:
+        affected = index.items_with_any(tag_mapping)
+        items = [item for item in items if item.id in affected]
+    changed = []
     for item in items:
-        new_tags = [tag_mapping.get(i,i) for i in item.tags]
+        new_tags = None
         if len(item.tags) > 0 and item.tags != ['']:
-            new_tags = list({tag for tag in new_tags if tag != ''})
-            if new_tags != list(set(item.tags)) and item.tags != []:
-                tag_dict['New Tags'].append(new_tags)
-            else:
-                tag_dict['New Tags'].append(None)
-        else:
-            tag_dict['New Tags'].append(None)
+            mapped_tags = list(dict.fromkeys(tag for tag in (tag_mapping.get(i,i) for i in item.tags) if tag != ''))
+            if set(mapped_tags) != set(item.tags):
+                new_tags = mapped_tags
+                changed.append((len(tag_dict['Item ID']), item, new_tags))
         tag_dict['Item ID'].append(item.id)
         tag_dict['Old Tags'].append(item.tags)
-    if update is True and gis != 'N/A':
-        for index in range(len(tag_dict['Item ID'])):
-            if tag_dict['New Tags'][index] is None:
-                update_item = gis.content.get(tag_dict['Item ID'][index])
-                update_item.update(item_properties={'tags':tag_dict['New Tags'][index]})
-    elif update is True and gis == 'N/A':
-        warnings.warn('Update set to true, but GIS login object not provided.')
-    return tag_dict
\ No newline at end of file
+        tag_dict['New Tags'].append(new_tags)
+        tag_dict['Status'].append(None)
+    if update is not True:
+        instrument.emit('portal.tag_update', items=len(tag_dict['Item ID']), changed=len(changed), updated=0, failed=0)
+        return tag_dict
+
+    #Skip items finished in a previous run
+    completed = set()
+    pending = changed
+    if journal is not None:
+        try:
+            with open(journal, encoding='utf-8') as journal_file:
+                completed = {json.loads(line)['id'] for line in journal_file if line.strip()}
+        except FileNotFoundError:
+            pass
+        for position, item, new_tags in changed:
+            if item.id in completed:
+                tag_dict['Status'][position] = 'Skipped (in journal)'
+        pending = [change for change in changed if change[1].id not in completed]
+
+    #Update Items
+    journal_lock = threading.Lock()
+    journal_file = open(journal, 'a', encoding='utf-8') if journal is not None else None
+    def update_one(change):
+        position, item, new_tags = change
+        status = _update_item_tags(item, new_tags, retries, backoff)
+        if status == 'Updated' and journal_file is not None:
+            with journal_lock:
+                journal_file.write(json.dumps({'id': item.id, 'tags': new_tags}) + '\n')
+                journal_file.flush()
+        return position, item, status
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for position, item, status in executor.map(update_one, pending):
+                tag_dict['Status'][position] = status
+                if index is not None and status == 'Updated':
+                    index.refresh([item])
+    finally:
+        if journal_file is not None:
+            journal_file.close()
+    instrument.emit('portal.tag_update', items=len(tag_dict['Item ID']), changed=len(changed), skipped=len(changed) - len(pending),
+                    updated=tag_dict['Status'].count('Updated'), failed=sum(1 for status in tag_dict['Status'] if status and status.startswith('Failed')))
+    return tag_dict
@@ -0,0 +1,164 @@
+"""
+Client for querying ArcGIS REST FeatureServer/MapServer layers.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import instrument
+from http_util import RateLimiter, get_with_retry, http_session
+
+class ArcGISRESTError(Exception):
+    '''
+    Raised when an ArcGIS REST endpoint returns an error response.
+    '''
+
+class FeatureLayer:
+    '''
+    Queries a single layer of an ArcGIS REST FeatureServer or MapServer.
+    Queries return every matching feature: object IDs are requested first and split into ranges no larger than the layer's `maxRecordCount`, which are then requested in parallel. Responses that still exceed the transfer limit are paged with `resultOffset`, which raises `ArcGISRESTError` if the layer does not support pagination.
+    `url`: Layer URL, ending in the layer number (e.g. `.../FeatureServer/0`).
+    `max_workers`: Maximum number of pages requested at the same time.
+        Default: `4`
+    `chunk_size`: Maximum number of features requested per page. By default the layer's `maxRecordCount` is used.
+        Default: `None`
+    `timeout`: Seconds to wait for the server on each attempt.
+        Default: `60`
+    `retries`: Number of times a failed request is retried with backoff.
+        Default: `3`
+    `rate_limit`: Maximum number of requests started per second. `None` for no limit.
+        Default: `None`
+    `cache`: `http_cache.HTTPCache` to serve responses from.
+        Default: `None`
+    `session`: `requests.Session` to send requests with. By default a pooled session sized to `max_workers` is created.
+        Default: `None`
+    '''
+    def __init__(self, url: str, max_workers: int = 4, chunk_size: int = None, timeout: float = 60, retries: int = 3, rate_limit: float = None, cache = None, session: requests.Session = None):
+        self.url = url.rstrip('/')
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.retries = retries
+        self.cache = cache
+        self._close_session = session is None
+        self.session = session if session is not None else http_session(max_workers)
+        self._rate_limiter = RateLimiter(rate_limit)
+        self._info = None
+
+    def _get(self, url: str, params: dict) -> dict:
+        response = get_with_retry(self.session, url, params=params, timeout=self.timeout, retries=self.retries, rate_limiter=self._rate_limiter, cache=self.cache)
+        if response.status_code != 200:
+            raise ArcGISRESTError(f'HTTP {response.status_code} from {url}.')
+        data = response.json()
+        if 'error' in data:
+            raise ArcGISRESTError(f'{data["error"].get("code")}: {data["error"].get("message")} ({url}).')
+        return data
+
+    def info(self) -> dict:
+        '''
+        Returns the layer's metadata. The result is kept for the life of the object.
+        '''
+        if self._info is None:
+            self._info = self._get(self.url, {'f': 'json'})
+        return self._info
+
+    def _page_size(self) -> int:
+        if self.chunk_size is not None:
+            return self.chunk_size
+        return self.info().get('maxRecordCount') or 1000
+
+    def object_ids(self, where: str = '1=1') -> tuple:
+        '''
+        Returns the name of the object ID field and a sorted list of object IDs for features matching `where`.
+        `where`: SQL where clause.
+            Default: `'1=1'`
+        '''
+        data = self._get(self.url + '/query', {'where': where, 'returnIdsOnly': 'true', 'f': 'json'})
+        return data['objectIdFieldName'], sorted(data.get('objectIds') or [])
+
+    def _query_pages(self, params: dict, key: str = 'features') -> list:
+        results = []
+        offset = 0
+        previous_page = None
+        while True:
+            page_params = dict(params)
+            if offset:
+                page_params['resultOffset'] = offset
+            data = self._get(self.url + '/query', page_params)
+            page = data.get(key, [])
+            #A server that ignores resultOffset returns the same page forever
+            if offset and page == previous_page:
+                raise ArcGISRESTError(f'{self.url} returned the same page for resultOffset {offset}, so the query cannot be paged.')
+            results.extend(page)
+            exceeded = data.get('exceededTransferLimit') or data.get('properties', {}).get('exceededTransferLimit')
+            if not exceeded or not page:
+                return results
+            if self.info().get('advancedQueryCapabilities', {}).get('supportsPagination') is False:
+                raise ArcGISRESTError(f'{self.url} exceeded its transfer limit but does not support pagination. Use a smaller chunk_size.')
+            previous_page = page
+            offset += len(page)
+
+    def query(self, where: str = '1=1', out_fields: list|str = '*', return_geometry: bool = False, distinct: bool = False, f: str = 'json', **params) -> list:
+        '''
+        Returns all features matching `where`, in object ID order.
+        `where`: SQL where clause.
+            Default: `'1=1'`
+        `out_fields`: List of fields to return. A string can also be used for a single field or a comma separated list.
+            Default: `'*'`
+        `return_geometry`: Whether to return feature geometry.
+            Default: `False`
+        `distinct`: Whether to return only distinct combinations of `out_fields` (`returnDistinctValues`). Geometry is not returned for distinct queries.
+            Default: `False`
+        `f`: Response format.
+            Accepted Values: `'json'`, `'geojson'`
+            Default: `'json'`
+        `**params`: Additional query parameters (e.g. `outSR`, `orderByFields`).
+        '''
+        if f not in ('json', 'geojson'):
+            raise ValueError(f'{f} is not a valid value for "f". Valid values are: "json" and "geojson".')
+        if not isinstance(out_fields, str):
+            out_fields = ','.join(out_fields)
+        params = {'outFields': out_fields, 'returnGeometry': str(return_geometry and not distinct).lower(), 'f': f, **params}
+
+        with instrument.timed('arcgis_rest.query', url=self.url, distinct=distinct) as event:
+            #Distinct values cannot be split by object ID, so they are paged directly, ordered so pages do not overlap
+            if distinct is True:
+                params['returnDistinctValues'] = 'true'
+                params.setdefault('resultRecordCount', self._page_size())
+                if out_fields != '*':
+                    params.setdefault('orderByFields', out_fields)
+                features = self._query_pages({'where': where, **params})
+                event['features'] = len(features)
+                return features
+
+            #Split object IDs into ranges and request them in parallel
+            oid_field, oids = self.object_ids(where)
+            page_size = self._page_size()
+            ranges = [(oids[index], oids[min(index + page_size, len(oids)) - 1]) for index in range(0, len(oids), page_size)]
+            page_params = [{'where': f'({where}) AND {oid_field} >= {low} AND {oid_field} <= {high}', **params} for low, high in ranges]
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                pages = executor.map(self._query_pages, page_params)
+                features = [feature for page in pages for feature in page]
+            event['features'] = len(features)
+            event['pages'] = len(page_params)
+            return features
+
+    def values(self, field: str, where: str = '1=1', distinct: bool = False) -> list:
+        '''
+        Returns the values of a single field for all features matching `where`.
+        `field`: Field to return.
+        `where`: SQL where clause.
+            Default: `'1=1'`
+        `distinct`: Whether to return each value once.
+            Default: `False`
+        '''
+        features = self.query(where, out_fields=field, distinct=distinct)
+        return [feature['attributes'][field] for feature in features]
+
+    def close(self) -> None:
+        if self._close_session:
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
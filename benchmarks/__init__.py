@@ -0,0 +1,4 @@
+"""
+Benchmarks for the bio_get, portal and attribute tools, run against local stand-ins for the NPSpecies API, the NPS boundary FeatureServer, an ArcGIS portal and arcpy tables.
+Run from the repository root with `python -m benchmarks.run_benchmarks`.
+"""
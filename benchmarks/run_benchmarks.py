@@ -0,0 +1,168 @@
+"""
+Records throughput and latency of the bio_get, portal and attribute tools at several data sizes, using the stand-ins in `benchmarks.stand_ins`.
+Run from the repository root:
+    python -m benchmarks.run_benchmarks [--quick] [--latency SECONDS] [--output bench_output.txt]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+import instrument
+import bio_get
+import UNTESTED
+import UNTESTED2
+import transfer_attrib
+from table_backend import MemoryBackend
+from benchmarks.stand_ins import FakeGIS, MockServer, key_tables, selection_tables
+
+SIZES = {'bio_get': [10, 100, 400], 'portal': [1000, 10000, 25000], 'table': [1000, 10000, 100000], 'transfer': [1000, 10000, 100000]}
+QUICK_SIZES = {'bio_get': [10, 50], 'portal': [1000, 5000], 'table': [1000, 10000], 'transfer': [1000, 10000]}
+IMPORT_MODULES = ['bio_get', 'arcgis_rest', 'http_cache', 'species_table', 'presence', 'UNTESTED', 'UNTESTED2', 'transfer_attrib', 'geo_util']
+
+def _latency(log: instrument.EventLog, event: str) -> str:
+    seconds = sorted(record['seconds'] for record in log.events if record['event'] == event)
+    if not seconds:
+        return ''
+    p95 = seconds[min(len(seconds) - 1, int(len(seconds) * 0.95))]
+    return f'{event} latency mean {statistics.fmean(seconds) * 1000:.2f} ms, p95 {p95 * 1000:.2f} ms'
+
+def _counts(log: instrument.EventLog) -> str:
+    summary = log.summary()
+    parts = []
+    for event in sorted(summary):
+        totals = summary[event]
+        detail = f'{event} x{totals["count"]}'
+        if totals.get('bytes'):
+            detail += f' ({totals["bytes"] / 1e6:.2f} MB)'
+        parts.append(detail)
+    return ', '.join(parts)
+
+def run(name: str, size: int, unit: str, func, report: list) -> None:
+    '''
+    Runs `func` with an `EventLog` registered and adds its throughput, latency and event counts to `report`. `func` returns the number of `unit` processed and the names of events to report latency for.
+    '''
+    with instrument.EventLog() as log:
+        start = time.perf_counter()
+        count, latency_events = func()
+        seconds = time.perf_counter() - start
+    lines = [f'{name} [{size}]: {seconds:.3f} s, {count / seconds if seconds else 0:,.0f} {unit}/s']
+    lines.extend(f'    {line}' for line in (_latency(log, event) for event in latency_events) if line)
+    lines.append(f'    events: {_counts(log)}')
+    report.extend(lines)
+    print('\n'.join(lines), flush=True)
+
+def bench_bio_get(sizes: list, latency: float, report: list) -> None:
+    for size in sizes:
+        with MockServer(units=size, records_per_unit=200, latency=latency) as server:
+            def unit_list():
+                return len(bio_get.nps_unit_list(layer_url=server.layer_url)), ['arcgis_rest.query', 'http.request']
+            run('nps_unit_list', size, 'units', unit_list, report)
+            units = server.units
+            for workers in (1, 8):
+                def api():
+                    return len(bio_get.npsspp_v3_api(units, max_workers=workers, base_url=server.npspecies_url)), ['bio_get.unit', 'http.request']
+                run(f'npsspp_v3_api max_workers={workers}', size, 'records', api, report)
+            def api_table():
+                return len(bio_get.npsspp_v3_api(units, max_workers=8, base_url=server.npspecies_url, as_table=True)), ['bio_get.unit']
+            run('npsspp_v3_api as_table max_workers=8', size, 'records', api_table, report)
+
+def bench_portal(sizes: list, latency: float, report: list) -> None:
+    for size in sizes:
+        gis = FakeGIS(size, owners=max(2, size // 4000), latency=latency)
+        items = []
+        def query():
+            items.extend(UNTESTED2.portal_query_type(gis))
+            return len(items), ['portal.search']
+        run('portal_query_type', size, 'items', query, report)
+        def tag_list():
+            UNTESTED2.portal_tag_list(items)
+            return len(items), ['portal.tag_list']
+        run('portal_tag_list', size, 'items', tag_list, report)
+        index = UNTESTED2.TagIndex(items)
+        def tag_list_index():
+            UNTESTED2.portal_tag_list(index)
+            return len(items), ['portal.tag_list']
+        run('portal_tag_list TagIndex', size, 'items', tag_list_index, report)
+        mapping = {'Tag 0': 'tag zero', 'Tag 1': ''}
+        def tag_update():
+            tag_dict = UNTESTED2.portal_tag_update(items, mapping, update=True, backoff=0)
+            return tag_dict['Status'].count('Updated'), ['portal.item_update']
+        run('portal_tag_update', size, 'updated items', tag_update, report)
+        index.refresh(items)
+        mapping = {'Tag 2': 'tag two'}
+        def tag_update_index():
+            tag_dict = UNTESTED2.portal_tag_update(items, mapping, update=True, index=index, backoff=0)
+            return tag_dict['Status'].count('Updated'), ['portal.item_update']
+        run('portal_tag_update TagIndex', size, 'updated items', tag_update_index, report)
+
+def bench_tables(sizes: list, report: list) -> None:
+    backend = MemoryBackend()
+    for size in sizes:
+        source, target = key_tables(size)
+        def keyed():
+            return UNTESTED.update_records_from(source, target, '*', 'm:m', key_field='KEY', backend=backend), ['table.join_update']
+        run('update_records_from m:m', size, 'rows', keyed, report)
+        def chunked():
+            return UNTESTED.update_records_from(source, target, '*', 'm:m', key_field='KEY', chunk_size=max(1, size // 10), backend=backend), ['table.join_update']
+        run('update_records_from m:m chunk_size=rows/10', size, 'rows', chunked, report)
+        fields = [f'FIELD{number}' for number in range(5)]
+        def ordered():
+            return UNTESTED.update_records_from(source, target, fields, '1:1', backend=backend), []
+        run('update_records_from 1:1 by order', size, 'rows', ordered, report)
+
+def bench_transfer(sizes: list, report: list) -> None:
+    backend = MemoryBackend()
+    fields = [f'FIELD{number}' for number in range(5)]
+    for size in sizes:
+        in_table, out_table = selection_tables(size)
+        def transfer():
+            for field in fields:
+                transfer_attrib.transfer_attributes(in_table, out_table, field, reset_selection=False, backend=backend)
+            return len(fields), ['table.edit_commit']
+        run('transfer_attributes one call per field', size, 'fields', transfer, report)
+        def session():
+            with transfer_attrib.EditSession(backend, reset_selection=False) as edits:
+                for field in fields:
+                    edits.transfer(in_table, out_table, field)
+            return len(fields), ['table.edit_commit']
+        run('EditSession one commit', size, 'fields', session, report)
+
+def bench_imports(report: list) -> None:
+    for module in IMPORT_MODULES:
+        code = f'import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)'
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+        if result.returncode != 0:
+            line = f'import {module}: failed ({result.stderr.strip().splitlines()[-1]})'
+        else:
+            line = f'import {module}: {float(result.stdout) * 1000:.1f} ms'
+        report.append(line)
+        print(line, flush=True)
+
+def main(argv: list = None) -> None:
+    parser = argparse.ArgumentParser(description='Benchmark the package against local stand-ins.')
+    parser.add_argument('--quick', action='store_true', help='Run only the smaller data sizes.')
+    parser.add_argument('--latency', type=float, default=0, help='Seconds each stand-in response is delayed by.')
+    parser.add_argument('--only', choices=['bio_get', 'portal', 'table', 'transfer', 'imports'], action='append', help='Run only these benchmarks. Can be repeated.')
+    parser.add_argument('--output', help='File to write the report to.')
+    args = parser.parse_args(argv)
+    sizes = QUICK_SIZES if args.quick else SIZES
+    only = set(args.only or ['bio_get', 'portal', 'table', 'transfer', 'imports'])
+
+    report = []
+    if 'bio_get' in only:
+        bench_bio_get(sizes['bio_get'], args.latency, report)
+    if 'portal' in only:
+        bench_portal(sizes['portal'], args.latency, report)
+    if 'table' in only:
+        bench_tables(sizes['table'], report)
+    if 'transfer' in only:
+        bench_transfer(sizes['transfer'], report)
+    if 'imports' in only:
+        bench_imports(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            output.write('\n'.join(report) + '\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+"""
+Local stand-ins for the services and tables used by the package, so benchmarks and tests run without network access, a portal login or ArcGIS Pro.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from table_backend import MemoryTable
+
+CATEGORIES = ['Vascular Plant', 'Reptile', 'Amphibian', 'Fish', 'Mammal', 'Bird']
+
+def unit_codes(count: int) -> list:
+    '''
+    Returns `count` distinct four letter unit codes.
+    '''
+    codes = []
+    for number in range(count):
+        code = ''
+        for _ in range(4):
+            number, letter = divmod(number, 26)
+            code = chr(65 + letter) + code
+        codes.append(code)
+    return codes
+
+def species_records(unit: str, count: int) -> list:
+    '''
+    Returns `count` checklist records shaped like NPSpecies responses for a unit.
+    '''
+    return [{'UnitCode': unit, 'Category': CATEGORIES[index % len(CATEGORIES)], 'SciName': f'Taxon {index}', 'CommonNames': f'Common {index}',
+             'TaxonCode': 100000 + index, 'Occurrence': 'Present', 'Nativeness': 'Native' if index % 3 else 'Non-native', 'Abundance': None}
+            for index in range(count)]
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    #Headers and body are sent in one write, as separate small writes stall on delayed ACKs
+    wbufsize = 65536
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send(self, data, status: int = 200) -> None:
+        body = json.dumps(data).encode('utf-8')
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            status, body = 304, b''
+        with self.server.stand_in.lock:
+            self.server.stand_in.statuses[status] += 1
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if status in (200, 304):
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        server = self.server.stand_in
+        if server.latency:
+            time.sleep(server.latency)
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = url.path.strip('/').split('/')
+        with server.lock:
+            server.requests += 1
+        if parts[:3] == ['NPSpecies', 'v3', 'rest'] and len(parts) >= 5:
+            unit = parts[4]
+            if unit in server.unit_delays:
+                time.sleep(server.unit_delays[unit])
+            if unit in server.failing_units:
+                self._send({'error': 'Server error'}, 500)
+            else:
+                self._send(species_records(unit, server.records_per_unit))
+        elif parts[:2] == ['FeatureServer', '0']:
+            self._send(server.layer_response(parts[2:], params))
+        else:
+            self._send({'error': {'code': 404, 'message': 'Not found'}}, 404)
+
+class MockServer:
+    '''
+    Threaded HTTP server standing in for the NPSpecies v3 API and the NPS boundary FeatureServer layer. Use it as a context manager.
+    The layer has `tracts_per_unit` features for each unit, so unit codes repeat as they do in the real boundary layer. It supports object ID queries, object ID range where clauses, distinct values and `resultOffset` paging.
+    `units`: Number of park units.
+        Default: `100`
+    `records_per_unit`: Number of species records returned for each unit.
+        Default: `200`
+    `tracts_per_unit`: Number of boundary layer features for each unit.
+        Default: `5`
+    `max_record_count`: Layer `maxRecordCount`.
+        Default: `1000`
+    `latency`: Seconds each response is delayed by, to imitate a remote server.
+        Default: `0`
+    `failing_units`: Unit codes that NPSpecies requests fail for with HTTP 500.
+        Default: `None`
+    `unit_delays`: Dictionary of unit codes and extra seconds their NPSpecies responses are delayed by.
+        Default: `None`
+    `pagination`: Whether the layer supports `resultOffset`. If `False`, the offset is ignored and the layer reports `supportsPagination` as `false`.
+        Default: `True`
+    Responses carry an `ETag` and requests with a matching `If-None-Match` get HTTP 304. `requests` counts requests and `statuses` counts responses by status code.
+    '''
+    def __init__(self, units: int = 100, records_per_unit: int = 200, tracts_per_unit: int = 5, max_record_count: int = 1000, latency: float = 0, failing_units: list = None, unit_delays: dict = None, pagination: bool = True):
+        self.units = unit_codes(units)
+        self.records_per_unit = records_per_unit
+        self.features = [{'OBJECTID': oid + 1, 'UNIT_CODE': self.units[oid // tracts_per_unit]} for oid in range(units * tracts_per_unit)]
+        self.max_record_count = max_record_count
+        self.latency = latency
+        self.failing_units = set(failing_units or ())
+        self.unit_delays = dict(unit_delays or {})
+        self.pagination = pagination
+        self.requests = 0
+        self.statuses = Counter()
+        self.lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    def layer_response(self, path: list, params: dict) -> dict:
+        if not path:
+            return {'name': 'Boundaries', 'objectIdField': 'OBJECTID', 'maxRecordCount': self.max_record_count,
+                    'advancedQueryCapabilities': {'supportsPagination': self.pagination}}
+        if params.get('returnIdsOnly') == 'true':
+            return {'objectIdFieldName': 'OBJECTID', 'objectIds': [feature['OBJECTID'] for feature in self.features]}
+        features = self.features
+        id_range = re.search(r'OBJECTID >= (\d+) AND OBJECTID <= (\d+)', params.get('where', ''))
+        if id_range:
+            low, high = int(id_range.group(1)), int(id_range.group(2))
+            features = features[low - 1:high]
+        out_fields = params.get('outFields', '*')
+        if out_fields != '*':
+            fields = out_fields.split(',')
+            features = [{field: feature[field] for field in fields} for feature in features]
+        if params.get('returnDistinctValues') == 'true':
+            features = list({json.dumps(feature, sort_keys=True): feature for feature in features}.values())
+        if params.get('orderByFields'):
+            order = [field.split()[0] for field in params['orderByFields'].split(',')]
+            features = sorted(features, key=lambda feature: [feature[field] for field in order])
+        offset = int(params.get('resultOffset', 0)) if self.pagination else 0
+        count = min(int(params.get('resultRecordCount', self.max_record_count)), self.max_record_count)
+        page = features[offset:offset + count]
+        return {'features': [{'attributes': feature} for feature in page], 'exceededTransferLimit': offset + count < len(features)}
+
+    def start(self):
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.stand_in = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self._httpd.server_address[1]}/'
+
+    @property
+    def npspecies_url(self) -> str:
+        '''
+        URL to pass to `base_url` of the bio_get functions.
+        '''
+        return self.url + 'NPSpecies/v3/rest/'
+
+    @property
+    def layer_url(self) -> str:
+        '''
+        URL of the boundary layer, to pass to `layer_url` of `bio_get.nps_unit_list`.
+        '''
+        return self.url + 'FeatureServer/0'
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+class FakeItem:
+    '''
+    Portal item with the attributes used by the portal tools. `update` imitates `arcgis.gis.Item.update` for tags.
+    '''
+    def __init__(self, item_id: str, owner: str, item_type: str, tags: list, latency: float = 0):
+        self.id = item_id
+        self.owner = owner
+        self.type = item_type
+        self.tags = tags
+        self.modified = 0
+        self.latency = latency
+
+    def update(self, item_properties: dict) -> bool:
+        if self.latency:
+            time.sleep(self.latency)
+        self.tags = list(item_properties['tags'])
+        self.modified += 1
+        return True
+
+class _FakeUser:
+    def __init__(self, username: str):
+        self.username = username
+
+class _FakeUsers:
+    def __init__(self, gis):
+        self._gis = gis
+
+    def search(self, max_users: int = 100) -> list:
+        return [_FakeUser(owner) for owner in self._gis.owners[:min(max_users, self._gis.listed_owners)]]
+
+class _FakeContent:
+    def __init__(self, gis):
+        self._gis = gis
+
+    def advanced_search(self, query: str, return_count: bool = False, start: int = 1, max_items: int = 100, sort_field: str = None, sort_order: str = None):
+        gis = self._gis
+        if gis.latency:
+            time.sleep(gis.latency)
+        with gis.lock:
+            gis.searches += 1
+        items = gis.items
+        owner = re.search(r'owner:"([^"]+)"', query)
+        if owner:
+            items = [item for item in items if item.owner == owner.group(1)]
+        item_type = re.search(r'AND type:"([^"]+)"', query)
+        if item_type:
+            items = [item for item in items if item.type == item_type.group(1)]
+        type_list = re.search(r'type:\(([^)]*)\)', query)
+        if type_list:
+            types = set(re.findall(r'"([^"]+)"', type_list.group(1)))
+            items = [item for item in items if item.type in types]
+        if return_count:
+            return len(items)
+        #Like a portal, results past the search limit are not returned
+        end = min(start - 1 + max_items, 10000)
+        return {'results': items[start - 1:end], 'total': len(items)}
+
+class FakeGIS:
+    '''
+    Stand-in for `arcgis.gis.GIS` with `content.advanced_search` and `users.search`, holding `item_count` items spread over owners and item types.
+    Like a portal, searches return at most the first 10,000 results.
+    `item_count`: Number of items.
+        Default: `1000`
+    `owners`: Number of item owners.
+        Default: `10`
+    `tags`: Number of distinct tags. Each item has three of them.
+        Default: `50`
+    `latency`: Seconds each search and item update is delayed by.
+        Default: `0`
+    `listed_owners`: Number of owners returned by `users.search`, to imitate owners hidden from user searches.
+        Default: `None`, all owners
+    '''
+    def __init__(self, item_count: int = 1000, owners: int = 10, tags: int = 50, latency: float = 0, listed_owners: int = None):
+        item_types = ['Feature Service', 'Web Map', 'Web Mapping Application', 'PDF', 'CSV']
+        self.owners = [f'user{number}' for number in range(owners)]
+        self.items = [FakeItem(f'{number:032x}', self.owners[number % owners], item_types[number % len(item_types)],
+                               [f'Tag {(number + offset) % tags}' for offset in range(3)], latency)
+                      for number in range(item_count)]
+        self.latency = latency
+        self.listed_owners = owners if listed_owners is None else listed_owners
+        self.searches = 0
+        self.lock = threading.Lock()
+        self.content = _FakeContent(self)
+        self.users = _FakeUsers(self)
+
+def key_tables(rows: int, fields: int = 5, matches: float = 1.0) -> tuple:
+    '''
+    Returns a source and a target `MemoryTable` with a `KEY` field and `fields` value fields, for keyed updates with `MemoryBackend`.
+    `rows`: Number of rows in each table.
+    `fields`: Number of value fields.
+        Default: `5`
+    `matches`: Fraction of target rows with a key found in the source table.
+        Default: `1.0`
+    '''
+    names = ['KEY'] + [f'FIELD{number}' for number in range(fields)]
+    matched = int(rows * matches)
+    source = MemoryTable(names, ([key] + [f'value {key} {number}' for number in range(fields)] for key in range(rows)))
+    target = MemoryTable(names, ([key if key < matched else -key - 1] + [None] * fields for key in range(rows)))
+    return source, target
+
+def selection_tables(rows: int, fields: int = 5) -> tuple:
+    '''
+    Returns an input `MemoryTable` with its first record selected and an output `MemoryTable` with its last record selected, for `transfer_attributes` with `MemoryBackend`.
+    `rows`: Number of rows in each table.
+    `fields`: Number of value fields.
+        Default: `5`
+    '''
+    names = [f'FIELD{number}' for number in range(fields)]
+    in_table = MemoryTable(names, ([f'value {row} {number}' for number in range(fields)] for row in range(rows)))
+    out_table = MemoryTable(names, ([None] * fields for _ in range(rows)))
+    in_table.select([0])
+    out_table.select([rows - 1])
+    return in_table, out_table
@@ -1,66 +1,251 @@
+import time
+import warnings
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import requests
+import instrument
+from arcgis_rest import FeatureLayer
+from http_util import RateLimiter, get_with_retry, http_session
+from species_table import SpeciesTable
 
-def nps_unit_list() -> list:
+NPSSPP_V3_URL = 'https://irmaservices.nps.gov/NPSpecies/v3/rest/'
+NPS_BOUNDARY_URL = 'https://services1.arcgis.com/fBc8EJBxQRMcHlei/arcgis/rest/services/NPS_Land_Resources_Division_Boundary_and_Tract_Data_Service/FeatureServer/0'
+
+#Suggested `http_cache.HTTPCache` TTLs: unit checklists for a day, the unit list for a week
+CACHE_TTLS = {NPSSPP_V3_URL: 86400, NPS_BOUNDARY_URL: 604800}
+
+UnitResult = namedtuple('UnitResult', ['unit', 'records', 'status_code', 'error'])
+UnitResult.__doc__ = '''
+Result of a NPSpecies request for a single park unit.
+`unit`: NPS unit code.
+`records`: List of records returned for the unit. `None` if the request failed.
+`status_code`: HTTP status code of the last response. `None` if no response was received.
+`error`: Description of why the request failed. `None` if the request succeeded.
+'''
+
+def nps_unit_list(cache = None, max_workers: int = 4, layer_url: str = NPS_BOUNDARY_URL) -> list:
     '''
-    Returns a list of National Park Service (NPS) unit codes.
+    Returns a list of National Park Service (NPS) unit codes, each listed once.
+    `cache`: `http_cache.HTTPCache` to serve the unit list from.
+        Default: `None`
+    `max_workers`: Maximum number of pages of the boundary layer requested at the same time.
+        Default: `4`
+    `layer_url`: URL of the FeatureServer layer with a `UNIT_CODE` field.
+        Default: `NPS_BOUNDARY_URL`
     '''
-    unit_list_url = 'https://services1.arcgis.com/fBc8EJBxQRMcHlei/arcgis/rest/services/NPS_Land_Resources_Division_Boundary_and_Tract_Data_Service/FeatureServer/0/query?where=1%3D1&outFields=UNIT_CODE&f=json'
-    request = requests.get(unit_list_url, timeout=20)
-    unit_list_data = request.json()
-    park_units = []
-    
-    for item in unit_list_data['features']:
-        park_units.append(item['attributes']['UNIT_CODE'])
-    
+    with instrument.timed('bio_get.nps_unit_list') as event, FeatureLayer(layer_url, max_workers=max_workers, timeout=20, cache=cache) as layer:
+        #Distinct values are requested so tracts of the same unit are not downloaded; duplicates are still removed in case the server ignores returnDistinctValues
+        park_units = list(dict.fromkeys(layer.values('UNIT_CODE', distinct=True)))
+        event['units'] = len(park_units)
     return park_units
 
-def npsspp_v3_api(park_units: list|str = None, categories: list|str = None, list_type: str = 'checklist', print_progress: bool = False) -> list:
+def _fetch_unit(session, unit: str, url: str, timeout: float, retries: int, backoff: float, rate_limiter: RateLimiter, cache) -> UnitResult:
+    with instrument.timed('bio_get.unit', unit=unit) as event:
+        result = _request_unit(session, unit, url, timeout, retries, backoff, rate_limiter, cache)
+        event['records'] = len(result.records) if result.records is not None else 0
+        event['error'] = result.error
+    return result
+
+def _request_unit(session, unit: str, url: str, timeout: float, retries: int, backoff: float, rate_limiter: RateLimiter, cache) -> UnitResult:
+    try:
+        request = get_with_retry(session, url, timeout=timeout, retries=retries, backoff=backoff, rate_limiter=rate_limiter, cache=cache)
+    except requests.RequestException as error:
+        return UnitResult(unit, None, None, f'{type(error).__name__}: {error}')
+    if request.status_code != 200:
+        return UnitResult(unit, None, request.status_code, f'HTTP {request.status_code}')
+    try:
+        return UnitResult(unit, request.json(), 200, None)
+    except ValueError as error:
+        return UnitResult(unit, None, 200, f'Invalid JSON: {error}')
+
+def npsspp_v3_units(park_units: list|str = None, categories: list|str = None, list_type: str = 'checklist', max_workers: int = 1, rate_limit: float = None, retries: int = 3, backoff: float = 0.5, timeout: float = 45, base_url: str = NPSSPP_V3_URL, session: requests.Session = None, cache = None):
     '''
-    Returns records in the NPSpecies (v3) database for specified park units. If no units are provided, all data is retrieved.
+    Yields a `UnitResult` for each park unit requested from the NPSpecies (v3) database, in the order of `park_units`.
+    Requests are sent through a shared connection-pooled session and up to `max_workers` units are requested at once. Failed units are yielded with `records` set to `None` and the reason in `error`.
 
     Params:
-    `park_units`: List of NPS unit codes. A string can also be used for a single unit.
-    `Categories`: List of species categories to filter on. A string can also be used for a single category.
-        Accepted Values: `'Vascular Plant'`, `'Reptile'`, `'Amphibian'`, `'Fish'`, `'Mammal'`, `'Bird'`
+    `park_units`: List of NPS unit codes. A string can also be used for a single unit. If no units are provided, all units are requested.
+    `categories`: List of species categories to filter on. A string can also be used for a single category. See `npsspp_v3_api`.
         Default: `None`
-        Note: Due to how the NPSpecies API functions, these values can be passed as upper/lower case and the values 1-5 can also be used and correlate to a specific category.
-    `list_type`: Type of data to return.
-        Accepted Values: `'checklist'`,`'detaillist'`,`'fulllist'`
+    `list_type`: Type of data to return. See `npsspp_v3_api`.
         Default: `'checklist'`
-    `print_progress`: Whether to print the position in `park_units`, name of park units, and number of records. Useful for seeing the time remaining when getting data for many units.
-        Default: `True`
+    `max_workers`: Maximum number of units requested at the same time.
+        Default: `1`
+    `rate_limit`: Maximum number of requests started per second, across all workers. `None` for no limit.
+        Default: `None`
+    `retries`: Number of times a request is retried after a connection error, timeout, or 429/5xx response.
+        Default: `3`
+    `backoff`: Seconds to wait before the first retry, doubled for each following retry.
+        Default: `0.5`
+    `timeout`: Seconds to wait for the server on each attempt.
+        Default: `45`
+    `base_url`: Root URL of the NPSpecies REST API. Can be pointed at a local server for testing.
+        Default: `NPSSPP_V3_URL`
+    `session`: `requests.Session` to send requests with. By default a pooled session sized to `max_workers` is created and closed when done.
+        Default: `None`
+    `cache`: `http_cache.HTTPCache` to serve responses from. Also used for the unit list when no units are provided.
+        Default: `None`
     '''
-    base_url = 'https://irmaservices.nps.gov/NPSpecies/v3/rest/'
     base_url = base_url + list_type + '/'
-    park_data = []
-    count = 1
 
     #Get Park Unit List/Format
     if park_units is None:
-        park_units = nps_unit_list()
+        park_units = nps_unit_list(cache)
     elif isinstance(park_units, str):
         park_units = [park_units]
 
     #Format Categories
     if categories is not None:
         if isinstance(categories, list):
-            categories = categories.join(',')
+            categories = ','.join(categories)
         categories = categories.replace(' ','%20')
         categories = '/' + categories
     else:
         categories = ''
 
-    #API Request
-    for unit in park_units:
-        unit_url = base_url + unit + categories + '?&format=Json'
-        request = requests.get(unit_url, timeout=45)
-        if request.status_code == 200:
-            unit_data = request.json()
-            park_data = park_data + unit_data
-            record_count = f', {len(unit_data)} Records'
+    #API Requests
+    ##Only a few requests beyond max_workers are queued so results are yielded in order without buffering every unit
+    close_session = session is None
+    if session is None:
+        session = http_session(max_workers)
+    rate_limiter = RateLimiter(rate_limit)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = deque()
+            for unit in park_units:
+                unit_url = base_url + unit + categories + '?&format=Json'
+                pending.append(executor.submit(_fetch_unit, session, unit, unit_url, timeout, retries, backoff, rate_limiter, cache))
+                if len(pending) >= max_workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+    finally:
+        if close_session:
+            session.close()
+
+def npsspp_v3_iter(park_units: list|str = None, categories: list|str = None, list_type: str = 'checklist', batches: bool = False, **kwargs):
+    '''
+    Yields records in the NPSpecies (v3) database for specified park units as each unit is received, so only a few units are held in memory at once. Units that could not be retrieved are skipped with a warning.
+
+    Params:
+    `park_units`: List of NPS unit codes. A string can also be used for a single unit. If no units are provided, all data is retrieved.
+    `categories`: List of species categories to filter on. See `npsspp_v3_api`.
+        Default: `None`
+    `list_type`: Type of data to return. See `npsspp_v3_api`.
+        Default: `'checklist'`
+    `batches`: Whether to yield a `UnitResult` for each successful unit instead of individual records.
+        Default: `False`
+    `**kwargs`: Passed to `npsspp_v3_units`.
+    '''
+    for result in npsspp_v3_units(park_units, categories, list_type, **kwargs):
+        if result.error is not None:
+            warnings.warn(f'No data retrieved for {result.unit}: {result.error}.')
+        elif batches is True:
+            yield result
         else:
-            record_count = ', No API Response'
+            yield from result.records
+
+def npsspp_v3_to_sink(sink, park_units: list|str = None, categories: list|str = None, list_type: str = 'checklist', print_progress: bool = False, **kwargs) -> list:
+    '''
+    Downloads records in the NPSpecies (v3) database and writes them to `sink` one unit at a time. Units the sink has already completed are skipped, so an interrupted download can be resumed by running it again with the same sink.
+    Returns a list of `UnitResult` for units that could not be retrieved.
+
+    Params:
+    `sink`: Sink to write to, such as `bio_sinks.NDJSONSink`, `bio_sinks.CSVSink`, or `bio_sinks.SQLiteSink`. Any object with a `completed_units` set and a `write(unit, records)` method can be used. A `CSVSink` raises `ValueError` if a later unit has a field missing from its header, so `NDJSONSink` or `SQLiteSink` is safer for full downloads.
+    `park_units`: List of NPS unit codes. A string can also be used for a single unit. If no units are provided, all data is retrieved.
+    `categories`: List of species categories to filter on. See `npsspp_v3_api`.
+        Default: `None`
+    `list_type`: Type of data to return. See `npsspp_v3_api`.
+        Default: `'checklist'`
+    `print_progress`: Whether to print the position in `park_units`, name of park units, and number of records.
+        Default: `False`
+    `**kwargs`: Passed to `npsspp_v3_units`.
+    '''
+    failures = []
+    count = 1
+
+    #Get Park Unit List/Format
+    if park_units is None:
+        park_units = nps_unit_list(kwargs.get('cache'))
+    elif isinstance(park_units, str):
+        park_units = [park_units]
+    park_units = [unit for unit in park_units if unit not in sink.completed_units]
+
+    for result in npsspp_v3_units(park_units, categories, list_type, **kwargs):
+        if result.error is None:
+            sink.write(result.unit, result.records)
+            record_count = f', {len(result.records)} Records'
+        else:
+            failures.append(result)
+            record_count = f', No API Response ({result.error})'
+        if print_progress is True:
+            print(f'{count}/{len(park_units)}: {result.unit}{record_count}')
+            count += 1
+    return failures
+
+def npsspp_v3_api(park_units: list|str = None, categories: list|str = None, list_type: str = 'checklist', print_progress: bool = False, max_workers: int = 1, rate_limit: float = None, retries: int = 3, failed_units: list = None, base_url: str = NPSSPP_V3_URL, cache = None, as_table: bool = False, unit_field: str = 'UnitCode') -> list|SpeciesTable:
+    '''
+    Returns records in the NPSpecies (v3) database for specified park units. If no units are provided, all data is retrieved.
+
+    Params:
+    `park_units`: List of NPS unit codes. A string can also be used for a single unit.
+    `Categories`: List of species categories to filter on. A string can also be used for a single category.
+        Accepted Values: `'Vascular Plant'`, `'Reptile'`, `'Amphibian'`, `'Fish'`, `'Mammal'`, `'Bird'`
+        Default: `None`
+        Note: Due to how the NPSpecies API functions, these values can be passed as upper/lower case and the values 1-5 can also be used and correlate to a specific category.
+    `list_type`: Type of data to return.
+        Accepted Values: `'checklist'`,`'detaillist'`,`'fulllist'`
+        Default: `'checklist'`
+    `print_progress`: Whether to print the position in `park_units`, name of park units, and number of records. Useful for seeing the time remaining when getting data for many units.
+        Default: `False`
+    `max_workers`: Maximum number of units requested at the same time.
+        Default: `1`
+    `rate_limit`: Maximum number of requests started per second. `None` for no limit.
+        Default: `None`
+    `retries`: Number of times a failed request is retried with backoff.
+        Default: `3`
+    `failed_units`: List that a `UnitResult` is appended to for every unit that could not be retrieved. If not provided, a warning listing the failed units is issued instead.
+        Default: `None`
+    `base_url`: Root URL of the NPSpecies REST API.
+        Default: `NPSSPP_V3_URL`
+    `cache`: `http_cache.HTTPCache` to serve responses from. With a cache, repeated runs only send requests for responses that have expired.
+        Default: `None`
+    `as_table`: Whether to return a columnar `species_table.SpeciesTable` instead of a list of records. Records are added to the table as each unit is received, so the list of records is never held in memory.
+        Default: `False`
+    `unit_field`: Name of the column holding the unit code of each record when `as_table` is `True`. `None` to not add the column.
+        Default: `'UnitCode'`
+    '''
+    park_data = SpeciesTable() if as_table is True else []
+    failures = []
+    count = 1
+    start_time = time.perf_counter()
+
+    #Get Park Unit List/Format
+    if park_units is None:
+        park_units = nps_unit_list(cache)
+    elif isinstance(park_units, str):
+        park_units = [park_units]
+
+    results = npsspp_v3_units(park_units, categories, list_type, max_workers=max_workers, rate_limit=rate_limit, retries=retries, base_url=base_url, cache=cache)
+    for result in results:
+        if result.error is None:
+            if as_table is False:
+                park_data.extend(result.records)
+            elif unit_field is not None:
+                park_data.append(result.records, **{unit_field: result.unit})
+            else:
+                park_data.append(result.records)
+            record_count = f', {len(result.records)} Records'
+        else:
+            failures.append(result)
+            record_count = f', No API Response ({result.error})'
         if print_progress is True:
-            print(f'{count}/{len(park_units)}: {unit}{record_count}')
+            print(f'{count}/{len(park_units)}: {result.unit}{record_count}')
             count += 1
+
+    if failed_units is not None:
+        failed_units.extend(failures)
+    elif failures:
+        warnings.warn(f'No data retrieved for {len(failures)} unit(s): {", ".join(result.unit for result in failures)}.')
+    instrument.emit('bio_get.npsspp_v3_api', seconds=time.perf_counter() - start_time, units=len(park_units), records=len(park_data), failed=len(failures))
     return park_data
@@ -0,0 +1,181 @@
+"""
+Incremental writers for NPSpecies records. Each sink writes one unit's records at a time and remembers which units have been written so an interrupted download can be resumed.
+"""
+import csv
+import json
+import os
+import sqlite3
+
+def _flat_value(value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+class _FileSink:
+    '''
+    Base class for sinks writing to a single text file. Completed units and the file size after each unit are logged to a `.units` file next to the output so a partially written unit can be truncated away when resuming.
+    '''
+    def __init__(self, path: str, unit_field: str = 'UnitCode', resume: bool = True):
+        self.path = path
+        self.unit_field = unit_field
+        self.progress_path = path + '.units'
+        self.completed_units = set()
+        end_offset = 0
+        if resume and os.path.exists(self.progress_path) and os.path.exists(path):
+            with open(self.progress_path, encoding='utf-8') as progress_file:
+                for line in progress_file:
+                    unit, offset = line.rstrip('\n').rsplit('\t', 1)
+                    self.completed_units.add(unit)
+                    end_offset = int(offset)
+            with open(path, 'r+b') as data_file:
+                data_file.truncate(end_offset)
+            self._file = open(path, 'a', newline='', encoding='utf-8')
+            self._progress = open(self.progress_path, 'a', encoding='utf-8')
+        else:
+            self._file = open(path, 'w', newline='', encoding='utf-8')
+            self._progress = open(self.progress_path, 'w', encoding='utf-8')
+        self._open(end_offset)
+
+    def _open(self, end_offset: int) -> None:
+        pass
+
+    def _write_records(self, records: list) -> None:
+        raise NotImplementedError()
+
+    def write(self, unit: str, records: list) -> None:
+        '''
+        Writes the records for a unit and marks the unit as completed.
+        `unit`: NPS unit code.
+        `records`: Records returned for the unit.
+        '''
+        if self.unit_field is not None:
+            records = [{self.unit_field: unit, **record} for record in records]
+        self._write_records(records)
+        self._file.flush()
+        self._progress.write(f'{unit}\t{self._file.tell()}\n')
+        self._progress.flush()
+        self.completed_units.add(unit)
+
+    def close(self) -> None:
+        self._file.close()
+        self._progress.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class NDJSONSink(_FileSink):
+    '''
+    Writes records to a newline-delimited JSON file, one record per line.
+    `path`: Output file path.
+    `unit_field`: Name of the field the unit code is written to. `None` to write records unchanged.
+        Default: `'UnitCode'`
+    `resume`: Whether to continue an existing file, skipping units already written. If `False`, the file is overwritten.
+        Default: `True`
+    '''
+    def _write_records(self, records: list) -> None:
+        for record in records:
+            self._file.write(json.dumps(record) + '\n')
+
+class CSVSink(_FileSink):
+    '''
+    Writes records to a CSV file. Lists and dictionaries are written as JSON text.
+    The header cannot change once written, so columns are taken from `fieldnames`, or else from the first unit written (or the existing header when resuming). A unit with a field not in the header raises `ValueError` before any of its records are written. Use `NDJSONSink` or `SQLiteSink` when later units may add fields.
+    `path`: Output file path.
+    `unit_field`: Name of the column the unit code is written to. `None` to write records unchanged.
+        Default: `'UnitCode'`
+    `resume`: Whether to continue an existing file, skipping units already written. If `False`, the file is overwritten.
+        Default: `True`
+    `fieldnames`: Columns of the file. Ignored when resuming a file that already has a header.
+        Default: `None`
+    '''
+    def __init__(self, path: str, unit_field: str = 'UnitCode', resume: bool = True, fieldnames: list = None):
+        self._fieldnames = None if fieldnames is None else list(fieldnames)
+        super().__init__(path, unit_field, resume)
+
+    def _open(self, end_offset: int) -> None:
+        self._writer = None
+        if end_offset > 0:
+            with open(self.path, newline='', encoding='utf-8') as existing_file:
+                fieldnames = next(csv.reader(existing_file))
+            self._writer = csv.DictWriter(self._file, fieldnames, extrasaction='ignore')
+
+    def _write_records(self, records: list) -> None:
+        if not records:
+            return
+        if self._writer is None:
+            fieldnames = self._fieldnames or list(dict.fromkeys(key for record in records for key in record))
+            self._writer = csv.DictWriter(self._file, fieldnames)
+            self._writer.writeheader()
+        new_fields = {key for record in records for key in record}.difference(self._writer.fieldnames)
+        if new_fields:
+            raise ValueError(f'Fields not in the CSV header of {self.path}: {", ".join(sorted(new_fields))}. Pass every column as fieldnames, or use NDJSONSink or SQLiteSink.')
+        self._writer.writerows({key: _flat_value(value) for key, value in record.items()} for record in records)
+
+class SQLiteSink:
+    '''
+    Writes records to a SQLite table. Columns are added as new fields are seen. Lists and dictionaries are stored as JSON text.
+    Each unit is written in a single transaction together with its entry in the `<table>_units` progress table, so a unit is either fully written or not at all.
+    `path`: SQLite database path.
+    `table`: Name of the table records are written to.
+        Default: `'npspecies'`
+    `unit_field`: Name of the column the unit code is written to. `None` to write records unchanged.
+        Default: `'UnitCode'`
+    `resume`: Whether to continue existing tables, skipping units already written. If `False`, existing tables are dropped.
+        Default: `True`
+    '''
+    def __init__(self, path: str, table: str = 'npspecies', unit_field: str = 'UnitCode', resume: bool = True):
+        self.path = path
+        self.table = table
+        self.unit_field = unit_field
+        self.connection = sqlite3.connect(path)
+        self._progress_table = f'{table}_units'
+        with self.connection:
+            if resume is False:
+                self.connection.execute(f'DROP TABLE IF EXISTS "{table}"')
+                self.connection.execute(f'DROP TABLE IF EXISTS "{self._progress_table}"')
+            self.connection.execute(f'CREATE TABLE IF NOT EXISTS "{self._progress_table}" (unit TEXT PRIMARY KEY)')
+        self.completed_units = {row[0] for row in self.connection.execute(f'SELECT unit FROM "{self._progress_table}"')}
+        self._columns = [row[1] for row in self.connection.execute(f'PRAGMA table_info("{table}")')]
+
+    def _add_columns(self, fields: list) -> None:
+        new_fields = [field for field in fields if field not in self._columns]
+        if not new_fields:
+            return
+        if not self._columns:
+            columns = ', '.join(f'"{field}"' for field in new_fields)
+            self.connection.execute(f'CREATE TABLE "{self.table}" ({columns})')
+        else:
+            for field in new_fields:
+                self.connection.execute(f'ALTER TABLE "{self.table}" ADD COLUMN "{field}"')
+        self._columns.extend(new_fields)
+
+    def write(self, unit: str, records: list) -> None:
+        '''
+        Writes the records for a unit and marks the unit as completed.
+        `unit`: NPS unit code.
+        `records`: Records returned for the unit.
+        '''
+        if self.unit_field is not None:
+            records = [{self.unit_field: unit, **record} for record in records]
+        with self.connection:
+            fields = list(dict.fromkeys(key for record in records for key in record))
+            self._add_columns(fields)
+            if fields:
+                columns = ', '.join(f'"{field}"' for field in fields)
+                placeholders = ', '.join('?' for _ in fields)
+                self.connection.executemany(f'INSERT INTO "{self.table}" ({columns}) VALUES ({placeholders})',
+                    ([_flat_value(record.get(field)) for field in fields] for record in records))
+            self.connection.execute(f'INSERT OR REPLACE INTO "{self._progress_table}" (unit) VALUES (?)', (unit,))
+        self.completed_units.add(unit)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,6 +1,23 @@
-import arcpy
+from lazy_import import arcpy
 
-def zoom_to_selection(selection_layer, scale = None, reset_selection = False):
+def layer_envelope_index(layer, where_clause: str = None, **kwargs):
+    '''
+    Returns a `spatial_index.EnvelopeIndex` of the envelopes of the features in a layer or feature class, keyed by ObjectID. Requires NumPy.
+    `layer`: Layer or feature class to index.
+    `where_clause`: SQL where clause limiting the features indexed.
+        Default: `None`
+    `**kwargs`: Passed to `EnvelopeIndex`.
+    '''
+    from spatial_index import EnvelopeIndex
+    rows = []
+    with arcpy.da.SearchCursor(layer, ['OID@', 'SHAPE@'], where_clause) as search_cursor:
+        for oid, shape in search_cursor:
+            if shape is not None:
+                extent = shape.extent
+                rows.append((oid, extent.XMin, extent.YMin, extent.XMax, extent.YMax))
+    return EnvelopeIndex.from_rows(rows, **kwargs)
+
+def zoom_to_selection(selection_layer, scale = None, reset_selection = False, index = None):
     '''
     Zooms to the extent of a selected feature. If no features are selected, zooms to the center of the feature.
     `selection_feature`: Map layer with the extent used for zoom in/out.
@@ -8,12 +25,26 @@ def zoom_to_selection(selection_layer, scale = None, reset_selection = False):
         Default: `None`
     reset_selection: If the current selection should be reset after zooming.
         Default: `False`
+    `index`: `spatial_index.EnvelopeIndex` of the layer (see `layer_envelope_index`). If provided, the extent of the selection is computed from the index instead of asking the map view. If a selected feature is not in the index, the map view is used.
+        Default: `None`
     '''
     #Pan to Extent
-    current_map = arcpy.mp.ArcGISProject("CURRENT").activeMap
-    map_view = arcpy.mp.ArcGISProject("CURRENT").activeView
+    project = arcpy.mp.ArcGISProject("CURRENT")
+    current_map = project.activeMap
+    map_view = project.activeView
     map_layer = current_map.listLayers(selection_layer)[0]
-    extent = map_view.getLayerExtent(map_layer, True, True)
+    extent = None
+    if index is not None:
+        description = arcpy.Describe(map_layer)
+        if description.FIDSet:
+            try:
+                xmin, ymin, xmax, ymax = index.extent(int(fid) for fid in description.FIDSet.split(';'))
+                extent = arcpy.Extent(xmin, ymin, xmax, ymax, spatial_reference=description.spatialReference)
+            except KeyError:
+                #Features added since the index was built are not in it, so the map view is asked instead
+                pass
+    if extent is None:
+        extent = map_view.getLayerExtent(map_layer, True, True)
     map_view.panToExtent(extent)
     
     #Change Scale
@@ -28,4 +59,4 @@ def zoom_to_selection(selection_layer, scale = None, reset_selection = False):
     if reset_selection is True:
         arcpy.management.SelectLayerByAttribute(in_layer_or_view = selection_layer, selection_type = "CLEAR_SELECTION", where_clause = "", invert_where_clause = None)
     
-    return extent
\ No newline at end of file
+    return extent
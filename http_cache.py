@@ -0,0 +1,160 @@
+"""
+On-disk cache for HTTP GET responses, stored in a SQLite database.
+"""
+import json
+import sqlite3
+import threading
+import time
+import requests
+import instrument
+from http_util import get_with_retry
+
+class CacheMissError(requests.RequestException):
+    '''
+    Raised when a cache in offline mode does not hold a response for the requested URL.
+    '''
+
+class CachedResponse:
+    '''
+    Response served from an `HTTPCache`. Supports the parts of `requests.Response` used in this package.
+    '''
+    def __init__(self, url: str, status_code: int, headers: dict, content: bytes, from_cache: bool):
+        self.url = url
+        self.status_code = status_code
+        self.headers = requests.structures.CaseInsensitiveDict(headers)
+        self.content = content
+        self.from_cache = from_cache
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+class HTTPCache:
+    '''
+    Caches successful GET responses on disk, keyed by request URL.
+    Fresh responses are served without a network request. Once a response is older than its TTL it is revalidated with `If-None-Match`/`If-Modified-Since` when the server sent an `ETag` or `Last-Modified` header, otherwise it is requested again.
+    When the cache grows past `max_bytes`, the least recently used responses are removed.
+    `path`: SQLite database path. `':memory:'` can be used for a cache that only lasts for the session.
+    `ttls`: Dictionary of URL prefixes and the number of seconds responses from URLs starting with them stay fresh. The longest matching prefix is used.
+        Default: `None`
+    `default_ttl`: Seconds responses stay fresh when no prefix in `ttls` matches.
+        Default: `86400`
+    `max_bytes`: Maximum total size of cached response bodies. `None` for no limit.
+        Default: `None`
+    `offline`: Whether to only serve responses from the cache, regardless of age. Uncached URLs raise `CacheMissError`.
+        Default: `False`
+    '''
+    def __init__(self, path: str, ttls: dict = None, default_ttl: float = 86400, max_bytes: int = None, offline: bool = False):
+        self.path = path
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute('''CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY, status_code INTEGER, headers TEXT, content BLOB,
+                size INTEGER, stored_at REAL, accessed_at REAL)''')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)')
+
+    def ttl(self, url: str) -> float:
+        '''
+        Returns the number of seconds a response for `url` stays fresh.
+        '''
+        prefixes = [prefix for prefix in self.ttls if url.startswith(prefix)]
+        if not prefixes:
+            return self.default_ttl
+        return self.ttls[max(prefixes, key=len)]
+
+    def _load(self, url: str):
+        with self._lock:
+            return self._connection.execute('SELECT status_code, headers, content, stored_at FROM responses WHERE url = ?', (url,)).fetchone()
+
+    def _touch(self, url: str, stored_at: float = None) -> None:
+        now = time.time()
+        with self._lock, self._connection:
+            if stored_at is None:
+                self._connection.execute('UPDATE responses SET accessed_at = ? WHERE url = ?', (now, url))
+            else:
+                self._connection.execute('UPDATE responses SET accessed_at = ?, stored_at = ? WHERE url = ?', (now, stored_at, url))
+
+    def _store(self, url: str, response) -> None:
+        now = time.time()
+        headers = {key: value for key, value in response.headers.items() if key.lower() in ('etag', 'last-modified', 'content-type')}
+        with self._lock, self._connection:
+            self._connection.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, response.status_code, json.dumps(headers), response.content, len(response.content), now, now))
+            if self.max_bytes is not None:
+                self._evict()
+
+    def _evict(self) -> None:
+        total = self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        remove = []
+        for url, size in self._connection.execute('SELECT url, size FROM responses ORDER BY accessed_at'):
+            if total <= self.max_bytes:
+                break
+            remove.append((url,))
+            total -= size
+        self._connection.executemany('DELETE FROM responses WHERE url = ?', remove)
+
+    def get(self, session: requests.Session, url: str, params: dict = None, **kwargs):
+        '''
+        Returns the response for a GET request, from the cache when possible. Only responses with status 200 are cached.
+        `session`: Session used when a network request is needed.
+        `url`: URL to request.
+        `params`: Query string parameters. They are part of the cache key.
+            Default: `None`
+        `**kwargs`: Passed to `http_util.get_with_retry`.
+        '''
+        url = requests.Request('GET', url, params=params).prepare().url
+        cached = self._load(url)
+        if cached is not None:
+            status_code, headers, content, stored_at = cached
+            headers = json.loads(headers)
+            if self.offline or time.time() - stored_at < self.ttl(url):
+                self._touch(url)
+                instrument.emit('http.cache', url=url, result='hit', bytes=len(content))
+                return CachedResponse(url, status_code, headers, content, True)
+        elif self.offline:
+            instrument.emit('http.cache', url=url, result='offline miss', bytes=0)
+            raise CacheMissError(f'{url} is not cached and the cache is in offline mode.')
+
+        #Revalidate or Request
+        request_headers = {}
+        if cached is not None:
+            lower_headers = {key.lower(): value for key, value in headers.items()}
+            if 'etag' in lower_headers:
+                request_headers['If-None-Match'] = lower_headers['etag']
+            if 'last-modified' in lower_headers:
+                request_headers['If-Modified-Since'] = lower_headers['last-modified']
+        response = get_with_retry(session, url, headers=request_headers or None, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            self._touch(url, time.time())
+            instrument.emit('http.cache', url=url, result='revalidated', bytes=len(content))
+            return CachedResponse(url, status_code, headers, content, True)
+        if response.status_code == 200:
+            self._store(url, response)
+        instrument.emit('http.cache', url=url, result='miss', bytes=0)
+        return response
+
+    def clear(self) -> None:
+        '''
+        Removes all cached responses.
+        '''
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM responses')
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
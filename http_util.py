@@ -0,0 +1,86 @@
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+import instrument
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+class RateLimiter:
+    '''
+    Thread-safe limiter that spaces out requests so no more than `rate` requests are started per second.
+    `rate`: Maximum number of requests per second. `None` or `0` disables the limit.
+    '''
+    def __init__(self, rate: float = None):
+        self.interval = 1 / rate if rate else 0
+        self._next_time = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        '''
+        Blocks until another request may be started.
+        '''
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start_time = max(now, self._next_time)
+            self._next_time = start_time + self.interval
+        if start_time > now:
+            time.sleep(start_time - now)
+
+def http_session(pool_size: int = 10) -> requests.Session:
+    '''
+    Returns a `requests.Session` with a connection pool large enough for `pool_size` concurrent requests, so TCP/TLS connections are reused between requests.
+    `pool_size`: Number of connections kept open per host.
+        Default: `10`
+    '''
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def get_with_retry(session: requests.Session, url: str, params: dict = None, timeout: float = 45, retries: int = 3, backoff: float = 0.5, rate_limiter: RateLimiter = None, headers: dict = None, cache = None) -> requests.Response:
+    '''
+    Sends a GET request, retrying connection errors, timeouts and transient HTTP errors (429 and 5xx) with exponential backoff.
+    Returns the last response received. Raises the last `requests.RequestException` if no response was received after all retries.
+    `session`: Session used to send the request.
+    `url`: URL to request.
+    `params`: Query string parameters.
+        Default: `None`
+    `timeout`: Seconds to wait for the server before giving up on an attempt.
+        Default: `45`
+    `retries`: Number of times a failed request is retried.
+        Default: `3`
+    `backoff`: Seconds to wait before the first retry. The wait doubles with each retry. A `Retry-After` header sent by the server takes precedence.
+        Default: `0.5`
+    `rate_limiter`: `RateLimiter` shared between requests. Each attempt waits on the limiter before being sent.
+        Default: `None`
+    `headers`: Additional request headers.
+        Default: `None`
+    `cache`: `http_cache.HTTPCache` to serve the response from. If provided, the request is only sent when the cache has no fresh response.
+        Default: `None`
+    '''
+    if cache is not None:
+        return cache.get(session, url, params=params, timeout=timeout, retries=retries, backoff=backoff, rate_limiter=rate_limiter)
+    for attempt in range(retries + 1):
+        if rate_limiter is not None:
+            rate_limiter.wait()
+        delay = backoff * 2 ** attempt
+        start_time = time.perf_counter()
+        try:
+            response = session.get(url, params=params, headers=headers, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout) as error:
+            instrument.emit('http.request', url=url, attempt=attempt, status_code=None, bytes=0, seconds=time.perf_counter() - start_time, error=type(error).__name__)
+            if attempt == retries:
+                raise
+        else:
+            if instrument.active():
+                instrument.emit('http.request', url=response.url, attempt=attempt, status_code=response.status_code, bytes=len(response.content), seconds=time.perf_counter() - start_time)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == retries:
+                return response
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                delay = int(retry_after)
+        time.sleep(delay)
@@ -0,0 +1,93 @@
+"""
+Instrumentation hooks. Functions in this package emit structured events (timings, request counts, bytes, cursor row counts) to any registered hooks. With no hooks registered, emitting an event does nothing.
+"""
+import threading
+import time
+import warnings
+from contextlib import contextmanager
+
+_hooks = []
+_lock = threading.Lock()
+
+def add_hook(hook) -> None:
+    '''
+    Registers a function called with a dictionary for every event emitted. Every event has `event` (its name) and `time` keys; other keys depend on the event. Hooks can be called from worker threads.
+    `hook`: Function taking one argument.
+    '''
+    with _lock:
+        _hooks.append(hook)
+
+def remove_hook(hook) -> None:
+    '''
+    Unregisters a hook added with `add_hook`.
+    `hook`: Function to remove.
+    '''
+    with _lock:
+        _hooks.remove(hook)
+
+def active() -> bool:
+    '''
+    Returns whether any hooks are registered. Use it to skip gathering event details that cost time.
+    '''
+    return bool(_hooks)
+
+def emit(event: str, **fields) -> None:
+    '''
+    Sends an event to every registered hook. A hook that raises an exception is reported with a warning, so it never interrupts the function emitting the event.
+    `event`: Event name, such as `'http.request'`.
+    `**fields`: Event details.
+    '''
+    if not _hooks:
+        return
+    record = {'event': event, 'time': time.time(), **fields}
+    for hook in list(_hooks):
+        try:
+            hook(record)
+        except Exception as error:
+            warnings.warn(f'Instrumentation hook {hook!r} raised {type(error).__name__} for "{event}" event: {error}', RuntimeWarning)
+
+@contextmanager
+def timed(event: str, **fields):
+    '''
+    Context manager that emits an event with a `seconds` key holding the time spent in the block. Yields a dictionary that the block can add event details to.
+    `event`: Event name.
+    `**fields`: Event details known before the block runs.
+    '''
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        if _hooks:
+            emit(event, seconds=time.perf_counter() - start, **fields)
+
+class EventLog:
+    '''
+    Hook that keeps every event it receives. Can be used as a context manager to register it for the length of a block.
+    '''
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def __call__(self, record: dict) -> None:
+        with self._lock:
+            self.events.append(record)
+
+    def __enter__(self):
+        add_hook(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        remove_hook(self)
+
+    def summary(self) -> dict:
+        '''
+        Returns a dictionary of each event name and its count, with totals of its numeric fields (such as `seconds`, `bytes` and `rows`).
+        '''
+        summary = {}
+        for record in self.events:
+            totals = summary.setdefault(record['event'], {'count': 0})
+            totals['count'] += 1
+            for key, value in record.items():
+                if key != 'time' and isinstance(value, (int, float)) and not isinstance(value, bool):
+                    totals[key] = totals.get(key, 0) + value
+        return summary
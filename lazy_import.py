@@ -0,0 +1,24 @@
+"""
+Deferred imports for heavy optional dependencies such as arcpy, which takes several seconds and a license check to import.
+"""
+import importlib
+
+class LazyModule:
+    '''
+    Stands in for a module and imports it the first time one of its attributes is used.
+    `name`: Name of the module to import.
+    '''
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute: str):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f'<LazyModule {self._name} ({state})>'
+
+arcpy = LazyModule('arcpy')
@@ -0,0 +1,213 @@
+"""
+Park by taxon presence-absence matrix for comparing species lists between park units.
+"""
+
+def _sorensen(intersection: int, count_a: int, count_b: int) -> float:
+    if count_a + count_b == 0:
+        return 0.0
+    return 2 * intersection / (count_a + count_b)
+
+def _jaccard(intersection: int, count_a: int, count_b: int) -> float:
+    union = count_a + count_b - intersection
+    if union == 0:
+        return 0.0
+    return intersection / union
+
+SIMILARITY_METHODS = {'jaccard': _jaccard, 'sorensen': _sorensen}
+
+class PresenceMatrix:
+    '''
+    Presence-absence matrix of taxa in park units.
+    Each park's taxa are stored as a bitset (a Python integer with one bit per taxon), so set operations between parks and pairwise similarity run on whole rows at once.
+    `taxa_by_park`: Dictionary of park unit codes and iterables of the taxa present in them.
+        Default: `None`
+    '''
+    def __init__(self, taxa_by_park: dict = None):
+        self.taxa = []
+        self._taxon_index = {}
+        self._rows = {}
+        self._counts = {}
+        if taxa_by_park is not None:
+            for park, taxa in taxa_by_park.items():
+                self.update_park(park, taxa)
+
+    @classmethod
+    def from_records(cls, records, park_field: str = 'UnitCode', taxon_field: str = 'SciName'):
+        '''
+        Builds a matrix from species records.
+        `records`: Iterable of record dictionaries, or a `species_table.SpeciesTable`.
+        `park_field`: Field holding the park unit code.
+            Default: `'UnitCode'`
+        `taxon_field`: Field identifying the taxon.
+            Default: `'SciName'`
+        '''
+        taxa_by_park = {}
+        if hasattr(records, 'groupby'):
+            taxa = records.column(taxon_field)
+            for park, rows in records.groupby(park_field).items():
+                taxa_by_park[park] = [taxa[row] for row in rows]
+        else:
+            for record in records:
+                taxa_by_park.setdefault(record[park_field], []).append(record[taxon_field])
+        return cls(taxa_by_park)
+
+    @classmethod
+    def from_units(cls, unit_results, taxon_field: str = 'SciName'):
+        '''
+        Builds a matrix from `bio_get.UnitResult` objects, such as those yielded by `bio_get.npsspp_v3_units`. Failed units are skipped.
+        `unit_results`: Iterable of `UnitResult`.
+        `taxon_field`: Field identifying the taxon.
+            Default: `'SciName'`
+        '''
+        matrix = cls()
+        for result in unit_results:
+            if result.records is not None:
+                matrix.update_park(result.unit, (record[taxon_field] for record in result.records))
+        return matrix
+
+    def _bits(self, taxa) -> int:
+        indices = []
+        for taxon in taxa:
+            index = self._taxon_index.get(taxon)
+            if index is None:
+                index = len(self.taxa)
+                self.taxa.append(taxon)
+                self._taxon_index[taxon] = index
+            indices.append(index)
+        #Bits are set in a byte buffer and converted once, since shifting into a large integer copies it each time
+        buffer = bytearray(len(self.taxa) // 8 + 1)
+        for index in indices:
+            buffer[index >> 3] |= 1 << (index & 7)
+        return int.from_bytes(buffer, 'little')
+
+    def _decode(self, bits: int) -> list:
+        #Binary string reversed so position i is the bit for taxon i
+        binary = bin(bits)[:1:-1]
+        return [self.taxa[index] for index, bit in enumerate(binary) if bit == '1']
+
+    def update_park(self, park: str, taxa) -> None:
+        '''
+        Sets the taxa present in a park, replacing any taxa previously stored for it. Use this when a single unit's checklist is refreshed.
+        `park`: Park unit code.
+        `taxa`: Iterable of taxa present in the park.
+        '''
+        bits = self._bits(taxa)
+        self._rows[park] = bits
+        self._counts[park] = bits.bit_count()
+
+    def remove_park(self, park: str) -> None:
+        '''
+        Removes a park from the matrix.
+        `park`: Park unit code.
+        '''
+        del self._rows[park]
+        del self._counts[park]
+
+    @property
+    def parks(self) -> list:
+        '''
+        List of park unit codes in the matrix.
+        '''
+        return list(self._rows)
+
+    def __contains__(self, park: str) -> bool:
+        return park in self._rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def count(self, park: str) -> int:
+        '''
+        Returns the number of taxa present in a park.
+        `park`: Park unit code.
+        '''
+        return self._counts[park]
+
+    def taxa_in(self, park: str) -> list:
+        '''
+        Returns the taxa present in a park.
+        `park`: Park unit code.
+        '''
+        return self._decode(self._rows[park])
+
+    def parks_with(self, taxon) -> list:
+        '''
+        Returns the parks where a taxon is present.
+        `taxon`: Taxon to search for.
+        '''
+        index = self._taxon_index.get(taxon)
+        if index is None:
+            return []
+        return [park for park, bits in self._rows.items() if bits >> index & 1]
+
+    def shared(self, *parks) -> list:
+        '''
+        Returns the taxa present in all of the parks.
+        `*parks`: Park unit codes.
+        '''
+        bits = self._rows[parks[0]]
+        for park in parks[1:]:
+            bits &= self._rows[park]
+        return self._decode(bits)
+
+    def union(self, *parks) -> list:
+        '''
+        Returns the taxa present in any of the parks.
+        `*parks`: Park unit codes.
+        '''
+        bits = 0
+        for park in parks:
+            bits |= self._rows[park]
+        return self._decode(bits)
+
+    def only_in(self, park: str, *other_parks) -> list:
+        '''
+        Returns the taxa present in `park` but in none of `other_parks`. If no other parks are given, taxa found in no other park in the matrix are returned.
+        `park`: Park unit code.
+        `*other_parks`: Park unit codes to exclude taxa of.
+        '''
+        if not other_parks:
+            other_parks = [other for other in self._rows if other != park]
+        others = 0
+        for other in other_parks:
+            others |= self._rows[other]
+        return self._decode(self._rows[park] & ~others)
+
+    def similarity(self, park_a: str, park_b: str, method: str = 'jaccard') -> float:
+        '''
+        Returns the similarity of the taxa in two parks.
+        `park_a`: Park unit code.
+        `park_b`: Park unit code.
+        `method`: Similarity index.
+            Accepted Values: `'jaccard'`, `'sorensen'`
+            Default: `'jaccard'`
+        '''
+        if method not in SIMILARITY_METHODS:
+            raise ValueError(f'{method} is not a valid value for "method". Valid values are: "jaccard" and "sorensen".')
+        intersection = (self._rows[park_a] & self._rows[park_b]).bit_count()
+        return SIMILARITY_METHODS[method](intersection, self._counts[park_a], self._counts[park_b])
+
+    def similarity_matrix(self, method: str = 'jaccard', parks: list = None) -> tuple:
+        '''
+        Returns a list of parks and a square matrix (list of lists) of the similarity between every pair of them, in the same order.
+        `method`: Similarity index.
+            Accepted Values: `'jaccard'`, `'sorensen'`
+            Default: `'jaccard'`
+        `parks`: Park unit codes to compare. If not provided, all parks are compared.
+            Default: `None`
+        '''
+        if method not in SIMILARITY_METHODS:
+            raise ValueError(f'{method} is not a valid value for "method". Valid values are: "jaccard" and "sorensen".')
+        index_func = SIMILARITY_METHODS[method]
+        if parks is None:
+            parks = self.parks
+        rows = [self._rows[park] for park in parks]
+        counts = [self._counts[park] for park in parks]
+        matrix = [[0.0] * len(parks) for _ in parks]
+        for i, (row_a, count_a) in enumerate(zip(rows, counts)):
+            matrix[i][i] = 1.0 if count_a else 0.0
+            for j in range(i + 1, len(parks)):
+                value = index_func((row_a & rows[j]).bit_count(), count_a, counts[j])
+                matrix[i][j] = value
+                matrix[j][i] = value
+        return parks, matrix
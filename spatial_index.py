@@ -0,0 +1,217 @@
+"""
+Envelope (bounding box) index for features, used to find the extent of feature selections and to answer bounding box queries without ArcGIS Pro.
+"""
+import numpy as np
+
+class EnvelopeIndex:
+    '''
+    Packed R-tree of feature envelopes, built with Sort-Tile-Recursive (STR) packing and stored as NumPy arrays.
+    Envelopes are `(xmin, ymin, xmax, ymax)`. Inserted, updated and removed features are tracked separately and checked directly until they make up `rebuild_ratio` of the index, when the tree is rebuilt.
+    `ids`: Feature IDs (such as ObjectIDs).
+        Default: `None`
+    `bounds`: Envelopes of the features, as an array with one `(xmin, ymin, xmax, ymax)` row per ID.
+        Default: `None`
+    `node_capacity`: Number of entries per tree node.
+        Default: `16`
+    `rebuild_ratio`: Fraction of features that can be changed since the last build before the tree is rebuilt.
+        Default: `0.1`
+    '''
+    def __init__(self, ids = None, bounds = None, node_capacity: int = 16, rebuild_ratio: float = 0.1):
+        self.node_capacity = node_capacity
+        self.rebuild_ratio = rebuild_ratio
+        self._changes = 0
+        self._ids = np.asarray([] if ids is None else ids)
+        self._bounds = np.empty((0, 4)) if bounds is None else np.asarray(bounds, dtype=float).reshape(-1, 4)
+        if len(self._ids) != len(self._bounds):
+            raise ValueError(f'{len(self._ids)} IDs were provided for {len(self._bounds)} envelopes.')
+        self.build()
+
+    @classmethod
+    def from_rows(cls, rows, **kwargs):
+        '''
+        Builds an index from an iterable of `(id, xmin, ymin, xmax, ymax)` rows.
+        `rows`: Iterable of rows.
+        `**kwargs`: Passed to `EnvelopeIndex`.
+        '''
+        rows = list(rows)
+        ids = [row[0] for row in rows]
+        bounds = np.array([row[1:5] for row in rows], dtype=float).reshape(-1, 4)
+        return cls(ids, bounds, **kwargs)
+
+    def build(self) -> None:
+        '''
+        Rebuilds the tree from all current features.
+        '''
+        if hasattr(self, '_alive'):
+            self._ids = self._ids[self._alive]
+            self._bounds = self._bounds[self._alive]
+        count = len(self._ids)
+        self._alive = np.ones(count, dtype=bool)
+        self._rows = {feature_id: row for row, feature_id in enumerate(self._ids.tolist())}
+        if len(self._rows) != count:
+            raise ValueError('Feature IDs must be unique.')
+        self._pending = set()
+        self._levels = []
+        if count == 0:
+            self._order = np.empty(0, dtype=np.intp)
+            return
+
+        #Sort-Tile-Recursive: sort by x into vertical slices, then by y within each slice
+        capacity = self.node_capacity
+        centers = (self._bounds[:, :2] + self._bounds[:, 2:]) / 2
+        leaf_count = -(-count // capacity)
+        slice_size = int(np.ceil(np.sqrt(leaf_count))) * capacity
+        x_rank = np.empty(count, dtype=np.intp)
+        x_rank[np.argsort(centers[:, 0], kind='stable')] = np.arange(count)
+        self._order = np.lexsort((centers[:, 1], x_rank // slice_size))
+
+        #Each level holds the envelopes of consecutive groups of `capacity` entries of the level below
+        level_bounds = self._bounds[self._order]
+        while True:
+            starts = np.arange(0, len(level_bounds), capacity)
+            level_bounds = np.column_stack([
+                np.minimum.reduceat(level_bounds[:, 0], starts),
+                np.minimum.reduceat(level_bounds[:, 1], starts),
+                np.maximum.reduceat(level_bounds[:, 2], starts),
+                np.maximum.reduceat(level_bounds[:, 3], starts)])
+            self._levels.append(level_bounds)
+            if len(level_bounds) <= capacity:
+                break
+
+    def __len__(self) -> int:
+        return int(self._alive.sum())
+
+    def __contains__(self, feature_id) -> bool:
+        row = self._rows.get(feature_id)
+        return row is not None and bool(self._alive[row])
+
+    def _lookup(self, ids) -> np.ndarray:
+        rows = np.fromiter((self._rows.get(feature_id, -1) for feature_id in ids), dtype=np.intp)
+        missing = rows < 0
+        if missing.any() or not self._alive[rows].all():
+            unknown = [feature_id for feature_id, row in zip(ids, rows) if row < 0 or not self._alive[row]]
+            raise KeyError(f'IDs not in index: {unknown[:10]}')
+        return rows
+
+    def update(self, ids, bounds) -> None:
+        '''
+        Inserts features, or replaces the envelopes of features already in the index.
+        `ids`: Feature IDs.
+        `bounds`: Envelopes of the features, one `(xmin, ymin, xmax, ymax)` row per ID.
+        '''
+        ids = list(ids)
+        bounds = np.asarray(bounds, dtype=float).reshape(-1, 4)
+        new_ids = []
+        new_bounds = []
+        for feature_id, envelope in zip(ids, bounds):
+            row = self._rows.get(feature_id)
+            if row is None:
+                new_ids.append(feature_id)
+                new_bounds.append(envelope)
+            else:
+                self._bounds[row] = envelope
+                self._alive[row] = True
+                self._pending.add(row)
+        if new_ids:
+            start = len(self._ids)
+            new_ids_array = np.asarray(new_ids)
+            self._ids = np.concatenate([self._ids, new_ids_array]) if start else new_ids_array
+            self._bounds = np.concatenate([self._bounds, np.asarray(new_bounds)])
+            self._alive = np.concatenate([self._alive, np.ones(len(new_ids), dtype=bool)])
+            for offset, feature_id in enumerate(new_ids):
+                self._rows[feature_id] = start + offset
+                self._pending.add(start + offset)
+        self._check_rebuild()
+
+    def remove(self, ids) -> None:
+        '''
+        Removes features from the index.
+        `ids`: Feature IDs.
+        '''
+        rows = self._lookup(list(ids))
+        self._alive[rows] = False
+        self._pending.difference_update(rows.tolist())
+        self._check_rebuild(len(rows))
+
+    def _check_rebuild(self, removed: int = 0) -> None:
+        self._changes += removed
+        if len(self._pending) + self._changes > self.rebuild_ratio * max(len(self._ids), 1):
+            self._changes = 0
+            self.build()
+
+    def extent(self, ids = None) -> tuple:
+        '''
+        Returns the combined envelope `(xmin, ymin, xmax, ymax)` of features, or `None` if there are none.
+        `ids`: Feature IDs. If not provided, the extent of all features is returned.
+            Default: `None`
+        '''
+        if ids is None:
+            bounds = self._bounds[self._alive]
+        else:
+            bounds = self._bounds[self._lookup(list(ids))]
+        if len(bounds) == 0:
+            return None
+        return (*bounds[:, :2].min(axis=0).tolist(), *bounds[:, 2:].max(axis=0).tolist())
+
+    def extents(self, id_groups) -> np.ndarray:
+        '''
+        Returns the combined envelope of each group of features, as an array with one `(xmin, ymin, xmax, ymax)` row per group. Groups without features get a row of NaN.
+        `id_groups`: Iterable of lists of feature IDs, such as one selection per exported map.
+        '''
+        groups = [list(group) for group in id_groups]
+        result = np.full((len(groups), 4), np.nan)
+        sizes = np.array([len(group) for group in groups], dtype=np.intp)
+        if sizes.sum() == 0:
+            return result
+        rows = self._lookup([feature_id for group in groups for feature_id in group])
+        bounds = self._bounds[rows]
+        filled = sizes > 0
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])[filled]
+        result[filled, 0] = np.minimum.reduceat(bounds[:, 0], starts)
+        result[filled, 1] = np.minimum.reduceat(bounds[:, 1], starts)
+        result[filled, 2] = np.maximum.reduceat(bounds[:, 2], starts)
+        result[filled, 3] = np.maximum.reduceat(bounds[:, 3], starts)
+        return result
+
+    def _candidate_rows(self, bbox) -> np.ndarray:
+        xmin, ymin, xmax, ymax = bbox
+        capacity = self.node_capacity
+        rows = np.empty(0, dtype=np.intp)
+        if self._levels:
+            nodes = np.arange(len(self._levels[-1]))
+            for depth in range(len(self._levels) - 1, -1, -1):
+                node_bounds = self._levels[depth][nodes]
+                nodes = nodes[(node_bounds[:, 0] <= xmax) & (node_bounds[:, 2] >= xmin) & (node_bounds[:, 1] <= ymax) & (node_bounds[:, 3] >= ymin)]
+                #Children of node n on the level below are n * capacity to n * capacity + capacity - 1
+                nodes = (nodes[:, None] * capacity + np.arange(capacity)).ravel()
+                size = len(self._levels[depth - 1]) if depth > 0 else len(self._order)
+                nodes = nodes[nodes < size]
+            rows = self._order[nodes]
+        if self._pending:
+            rows = np.union1d(rows, np.fromiter(self._pending, dtype=np.intp))
+        return rows[self._alive[rows]]
+
+    def query(self, bbox, predicate: str = 'intersects') -> np.ndarray:
+        '''
+        Returns the IDs of features whose envelopes intersect, or are within, a bounding box.
+        `bbox`: Bounding box `(xmin, ymin, xmax, ymax)`.
+        `predicate`: Spatial relationship to test.
+            Accepted Values: `'intersects'`, `'within'`
+            Default: `'intersects'`
+        '''
+        if predicate not in ('intersects', 'within'):
+            raise ValueError(f'{predicate} is not a valid value for "predicate". Valid values are: "intersects" and "within".')
+        xmin, ymin, xmax, ymax = bbox
+        rows = self._candidate_rows(bbox)
+        bounds = self._bounds[rows]
+        if predicate == 'intersects':
+            match = (bounds[:, 0] <= xmax) & (bounds[:, 2] >= xmin) & (bounds[:, 1] <= ymax) & (bounds[:, 3] >= ymin)
+        else:
+            match = (bounds[:, 0] >= xmin) & (bounds[:, 2] <= xmax) & (bounds[:, 1] >= ymin) & (bounds[:, 3] <= ymax)
+        return self._ids[np.sort(rows[match])]
+
+    def intersects(self, bbox) -> np.ndarray:
+        '''
+        Returns the IDs of features whose envelopes intersect a bounding box `(xmin, ymin, xmax, ymax)`.
+        '''
+        return self.query(bbox, 'intersects')
@@ -0,0 +1,366 @@
+"""
+Columnar container for species records. Values are stored per column in typed arrays instead of one dictionary per record, and repeated values such as names, categories and unit codes are dictionary-encoded.
+"""
+from array import array
+from collections.abc import Hashable
+
+class _Column:
+    '''
+    Single column of a `SpeciesTable`.
+    Kinds:
+        `'int'`: Integers in an `array('q')`.
+        `'float'`: Floats in an `array('d')`. Integers in a column that also holds floats are stored here too, flagged in `ints` so they are read back as integers.
+        `'category'`: Codes in an `array('I')` indexing into `categories`. Used for strings, booleans, and other hashable values.
+        `'object'`: Unhashable values (lists, dictionaries) in a list.
+    `int` and `float` columns store `None` as 0 and clear its flag in the `valid` mask. `valid` and `ints` are `array('B')` with one flag per row, created only once a row needs them.
+    '''
+    __slots__ = ('kind', 'data', 'categories', 'lookup', 'valid', 'ints', 'shared')
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.categories = None
+        self.lookup = None
+        self.valid = None
+        self.ints = None
+        #Whether `categories` and `lookup` are shared with another column and must be copied before adding to them
+        self.shared = False
+        if kind == 'int':
+            self.data = array('q')
+        elif kind == 'float':
+            self.data = array('d')
+        elif kind == 'category':
+            self.data = array('I')
+            self.categories = []
+            self.lookup = {}
+        else:
+            self.data = []
+
+    @staticmethod
+    def kind_of(value) -> str:
+        #Columns starting with None are numeric until a value of another kind is added, so nulls do not force dictionary encoding
+        if value is None or (type(value) is int and -2**63 <= value < 2**63):
+            return 'int'
+        if type(value) is float:
+            return 'float'
+        if isinstance(value, Hashable):
+            return 'category'
+        return 'object'
+
+    @classmethod
+    def from_values(cls, kind: str, values):
+        column = cls(kind)
+        for value in values:
+            column.append(value)
+        return column
+
+    def _code(self, value) -> int:
+        #True == 1 and 1.0 == 1, so the type is part of the key to keep values distinct
+        key = (type(value), value)
+        code = self.lookup.get(key)
+        if code is None:
+            if self.shared:
+                self.categories = list(self.categories)
+                self.lookup = dict(self.lookup)
+                self.shared = False
+            code = len(self.categories)
+            self.categories.append(value)
+            self.lookup[key] = code
+        return code
+
+    def _append_number(self, number, valid: bool = True, is_int: bool = False) -> None:
+        if not valid and self.valid is None:
+            self.valid = array('B', bytes([1]) * len(self.data))
+        if is_int and self.ints is None:
+            self.ints = array('B', bytes(len(self.data)))
+        self.data.append(number)
+        if self.valid is not None:
+            self.valid.append(valid)
+        if self.ints is not None:
+            self.ints.append(is_int)
+
+    def _promote(self, value) -> None:
+        kind = self.kind_of(value)
+        if kind == 'float' and self.kind == 'int':
+            new_kind = 'float'
+        elif kind == 'object' or self.kind == 'object':
+            new_kind = 'object'
+        else:
+            new_kind = 'category'
+        promoted = _Column.from_values(new_kind, self)
+        for slot in self.__slots__:
+            setattr(self, slot, getattr(promoted, slot))
+
+    def append(self, value) -> None:
+        if self.kind == 'int':
+            if type(value) is int and -2**63 <= value < 2**63:
+                self._append_number(value)
+                return
+            if value is None:
+                self._append_number(0, valid=False)
+                return
+        elif self.kind == 'float':
+            if type(value) is float:
+                self._append_number(value)
+                return
+            if value is None:
+                self._append_number(0.0, valid=False)
+                return
+            #Integers are only stored as floats while they convert exactly
+            if type(value) is int and -2**53 <= value <= 2**53:
+                self._append_number(value, is_int=True)
+                return
+        elif self.kind == 'category':
+            if isinstance(value, Hashable):
+                self.data.append(self._code(value))
+                return
+        else:
+            self.data.append(value)
+            return
+        self._promote(value)
+        self.append(value)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, index: int):
+        if self.kind == 'category':
+            return self.categories[self.data[index]]
+        if self.valid is not None and not self.valid[index]:
+            return None
+        if self.ints is not None and self.ints[index]:
+            return int(self.data[index])
+        return self.data[index]
+
+    def __iter__(self):
+        if self.kind == 'category':
+            categories = self.categories
+            return (categories[code] for code in self.data)
+        if self.valid is None and self.ints is None:
+            return iter(self.data)
+        return (self[index] for index in range(len(self.data)))
+
+    def take(self, indices):
+        column = _Column(self.kind)
+        if self.kind == 'category':
+            #Dictionaries are shared until either column adds a value to them
+            column.categories = self.categories
+            column.lookup = self.lookup
+            column.shared = self.shared = True
+            column.data = array('I', (self.data[index] for index in indices))
+        elif self.kind == 'object':
+            column.data = [self.data[index] for index in indices]
+        else:
+            column.data = array(self.data.typecode, (self.data[index] for index in indices))
+            if self.valid is not None:
+                column.valid = array('B', (self.valid[index] for index in indices))
+            if self.ints is not None:
+                column.ints = array('B', (self.ints[index] for index in indices))
+        return column
+
+    def matches(self, values: set) -> list:
+        '''
+        Returns the row indices with a value in `values`.
+        '''
+        if self.kind == 'category':
+            codes = {self.lookup[(type(value), value)] for value in values if isinstance(value, Hashable) and (type(value), value) in self.lookup}
+            return [index for index, code in enumerate(self.data) if code in codes]
+        return [index for index, value in enumerate(self) if value in values]
+
+    def nbytes(self) -> int:
+        if self.kind == 'object':
+            return len(self.data) * 8
+        flags = (len(self.valid) if self.valid is not None else 0) + (len(self.ints) if self.ints is not None else 0)
+        return len(self.data) * self.data.itemsize + flags
+
+class SpeciesTable:
+    '''
+    Columnar table of species records, such as those returned by `bio_get.npsspp_v3_api`.
+    Text and other repeated values are dictionary-encoded (each distinct value is stored once and rows hold a 4 byte code), integers and floats are stored in typed arrays with a 1 byte null flag per row once a column holds `None`. Records missing a field hold `None` for it.
+    Use `to_records` to get the records back as a list of dictionaries.
+    `records`: Records to load into the table.
+        Default: `None`
+    '''
+    def __init__(self, records: list = None):
+        self._columns = {}
+        self._length = 0
+        if records is not None:
+            self.append(records)
+
+    @classmethod
+    def _from_columns(cls, columns: dict, length: int):
+        table = cls()
+        table._columns = columns
+        table._length = length
+        return table
+
+    def append(self, records, **constants) -> None:
+        '''
+        Adds records to the table.
+        `records`: Iterable of record dictionaries.
+        `**constants`: Fields set to the same value for every record added, such as `UnitCode='YELL'`.
+        '''
+        columns = self._columns
+        for record in records:
+            if constants:
+                record = {**constants, **record}
+            for field, value in record.items():
+                column = columns.get(field)
+                if column is None:
+                    column = _Column(_Column.kind_of(value))
+                    for _ in range(self._length):
+                        column.append(None)
+                    columns[field] = column
+                column.append(value)
+            self._length += 1
+            for column in columns.values():
+                if len(column) < self._length:
+                    column.append(None)
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def columns(self) -> list:
+        '''
+        List of column names.
+        '''
+        return list(self._columns)
+
+    def column(self, name: str) -> list:
+        '''
+        Returns the values of a column as a list.
+        `name`: Column name.
+        '''
+        return list(self._columns[name])
+
+    def categories(self, name: str) -> list:
+        '''
+        Returns the distinct values of a column in the order they were first seen.
+        `name`: Column name.
+        '''
+        column = self._columns[name]
+        if column.kind == 'category':
+            return list(column.categories)
+        return list(dict.fromkeys(column))
+
+    def take(self, indices):
+        '''
+        Returns a new table with the rows at `indices`. Dictionary-encoded columns share their dictionaries with this table.
+        `indices`: Row indices to keep.
+        '''
+        indices = list(indices)
+        columns = {name: column.take(indices) for name, column in self._columns.items()}
+        return SpeciesTable._from_columns(columns, len(indices))
+
+    def filter(self, **conditions):
+        '''
+        Returns a new table with the rows matching all conditions.
+        `**conditions`: Column names and the value to match. A list, tuple or set matches any of its values (e.g. `Category=['Bird', 'Mammal']`).
+        '''
+        indices = None
+        for name, values in conditions.items():
+            if not isinstance(values, (list, tuple, set, frozenset)):
+                values = [values]
+            matches = self._columns[name].matches(set(values)) if name in self._columns else []
+            if indices is None:
+                indices = matches
+            else:
+                keep = set(indices)
+                indices = [index for index in matches if index in keep]
+        if indices is None:
+            indices = range(self._length)
+        return self.take(indices)
+
+    def groupby(self, name: str) -> dict:
+        '''
+        Returns a dictionary of each value in a column and an `array` of the row indices holding it.
+        `name`: Column name.
+        '''
+        column = self._columns[name]
+        if column.kind == 'category':
+            code_groups = [array('I') for _ in column.categories]
+            for index, code in enumerate(column.data):
+                code_groups[code].append(index)
+            return {column.categories[code]: rows for code, rows in enumerate(code_groups) if rows}
+        groups = {}
+        for index, value in enumerate(column):
+            groups.setdefault(value, array('I')).append(index)
+        return groups
+
+    def value_counts(self, name: str) -> dict:
+        '''
+        Returns a dictionary of each value in a column and the number of rows holding it.
+        `name`: Column name.
+        '''
+        column = self._columns[name]
+        if column.kind == 'category':
+            counts = [0] * len(column.categories)
+            for code in column.data:
+                counts[code] += 1
+            return {column.categories[code]: count for code, count in enumerate(counts) if count}
+        counts = {}
+        for value in column:
+            counts[value] = counts.get(value, 0) + 1
+        return counts
+
+    def iter_records(self):
+        '''
+        Yields each row as a record dictionary.
+        '''
+        names = list(self._columns)
+        for row in zip(*self._columns.values()):
+            yield dict(zip(names, row))
+
+    def to_records(self) -> list:
+        '''
+        Returns the table as a list of record dictionaries, the format returned by `bio_get.npsspp_v3_api`.
+        '''
+        return list(self.iter_records())
+
+    def nbytes(self) -> int:
+        '''
+        Returns the approximate number of bytes used by the column arrays, excluding the dictionaries of distinct values.
+        '''
+        return sum(column.nbytes() for column in self._columns.values())
+
+    def to_pandas(self):
+        '''
+        Returns the table as a `pandas.DataFrame`. Dictionary-encoded text columns become categorical columns. Requires pandas.
+        '''
+        import pandas as pd
+        data = {}
+        for name, column in self._columns.items():
+            if column.kind == 'category' and all(isinstance(value, str) or value is None for value in column.categories):
+                categories = [value for value in column.categories if value is not None]
+                remap = array('i', (-1 if value is None else position for position, value in _positions(column.categories)))
+                codes = [remap[code] for code in column.data]
+                data[name] = pd.Categorical.from_codes(codes, categories)
+            else:
+                data[name] = list(column)
+        return pd.DataFrame(data)
+
+    def to_arrow(self):
+        '''
+        Returns the table as a `pyarrow.Table`. Dictionary-encoded text columns become dictionary arrays. Requires pyarrow.
+        '''
+        import pyarrow as pa
+        arrays = {}
+        for name, column in self._columns.items():
+            if column.kind == 'category' and all(isinstance(value, str) or value is None for value in column.categories):
+                categories = [value for value in column.categories if value is not None]
+                remap = [None if value is None else position for position, value in _positions(column.categories)]
+                indices = pa.array([remap[code] for code in column.data], type=pa.int32())
+                arrays[name] = pa.DictionaryArray.from_arrays(indices, pa.array(categories, type=pa.string()))
+            elif column.kind in ('int', 'float') and column.valid is None and column.ints is None:
+                arrays[name] = pa.array(column.data)
+            else:
+                arrays[name] = pa.array(list(column))
+        return pa.table(arrays)
+
+def _positions(categories: list):
+    #Yields (position excluding None, value) so codes can be remapped onto a dictionary without None
+    position = 0
+    for value in categories:
+        yield (None if value is None else position), value
+        if value is not None:
+            position += 1
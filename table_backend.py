@@ -0,0 +1,293 @@
+"""
+Table backends used by the attribute tools. Each backend exposes the same cursor-style interface as `arcpy.da`, so the tools can run against ArcGIS tables, SQLite tables, or in-memory tables.
+The backend used when none is passed to a function is chosen on first use by `get_backend`.
+"""
+import os
+import sqlite3
+from lazy_import import arcpy
+
+class TableBackend:
+    '''
+    Interface for table access. Cursors only visit selected records when a table has a selection.
+    '''
+    def fields(self, table) -> list:
+        '''
+        Returns the names of the editable fields in a table.
+        '''
+        raise NotImplementedError()
+
+    def search_cursor(self, table, fields: list):
+        '''
+        Returns a context manager that iterates over rows (tuples of `fields` values) of a table.
+        '''
+        raise NotImplementedError()
+
+    def update_cursor(self, table, fields: list):
+        '''
+        Returns a context manager that iterates over rows (lists of `fields` values) of a table. Pass a changed row to its `updateRow` method to save it.
+        '''
+        raise NotImplementedError()
+
+    def get_count(self, table) -> int:
+        '''
+        Returns the number of records in a table, or the number selected if it has a selection.
+        '''
+        raise NotImplementedError()
+
+    def selection_ids(self, table):
+        '''
+        Returns the set of selected record IDs, or `None` if the table has no selection.
+        '''
+        raise NotImplementedError()
+
+    def clear_selection(self, table) -> None:
+        '''
+        Clears the selection of a table.
+        '''
+        raise NotImplementedError()
+
+    def selection_count(self, table) -> int:
+        '''
+        Returns a count of the number of records selected in a table.
+        Returns -1 if all records in a table are selected and 0 if there is no selection.
+        '''
+        selected = self.selection_ids(table)
+        if not selected:
+            return 0
+        if len(selected) == self.total_count(table):
+            return -1
+        return len(selected)
+
+    def total_count(self, table) -> int:
+        '''
+        Returns the number of records in a table, ignoring any selection.
+        '''
+        raise NotImplementedError()
+
+class ArcpyBackend(TableBackend):
+    '''
+    Backend for tables, feature classes and layers opened with arcpy. Requires ArcGIS Pro.
+    '''
+    def __init__(self):
+        self.arcpy = arcpy
+
+    def fields(self, table) -> list:
+        return [field.name for field in self.arcpy.ListFields(table) if field.editable and field.type not in ('OID', 'Geometry', 'GlobalID')]
+
+    def search_cursor(self, table, fields: list):
+        return self.arcpy.da.SearchCursor(table, fields)
+
+    def update_cursor(self, table, fields: list):
+        return self.arcpy.da.UpdateCursor(table, fields)
+
+    def get_count(self, table) -> int:
+        return int(self.arcpy.management.GetCount(table)[0])
+
+    def selection_ids(self, table):
+        fid_set = self.arcpy.Describe(table).FIDSet
+        if not fid_set:
+            return None
+        return {int(fid) for fid in fid_set.split(';')}
+
+    def total_count(self, table) -> int:
+        return int(self.arcpy.management.GetCount(self.arcpy.Describe(table).catalogPath)[0])
+
+    def clear_selection(self, table) -> None:
+        self.arcpy.management.SelectLayerByAttribute(in_layer_or_view = table, selection_type = "CLEAR_SELECTION", where_clause = "", invert_where_clause = None)
+
+class _ListCursor:
+    '''
+    Cursor over rows of a `MemoryBackend` table or a SQLite query.
+    '''
+    def __init__(self, rows, save = None, as_list: bool = False):
+        self._rows = iter(rows)
+        self._save = save
+        self._as_list = as_list
+        self._current = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        key, row = next(self._rows)
+        self._current = key
+        return list(row) if self._as_list else tuple(row)
+
+    def updateRow(self, row) -> None:
+        self._save(self._current, row)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class MemoryTable:
+    '''
+    Table held in memory for use with `MemoryBackend`. Record IDs are row positions.
+    `fields`: List of field names.
+    `rows`: List of rows, each a list of values in the order of `fields`.
+        Default: `None`
+    '''
+    def __init__(self, fields: list, rows: list = None):
+        self.field_names = list(fields)
+        self.rows = [list(row) for row in rows or []]
+        self.selection = None
+
+    def select(self, ids) -> None:
+        '''
+        Selects records by ID (row position). `None` clears the selection.
+        '''
+        self.selection = None if ids is None else set(ids)
+
+class MemoryBackend(TableBackend):
+    '''
+    Backend for `MemoryTable` objects. Tables are passed to functions directly.
+    '''
+    def _positions(self, table: MemoryTable, fields: list) -> list:
+        if isinstance(fields, str):
+            fields = [fields]
+        return [table.field_names.index(field) for field in fields]
+
+    def _rows(self, table: MemoryTable, positions: list):
+        for row_id, row in enumerate(table.rows):
+            if table.selection is None or row_id in table.selection:
+                yield row_id, [row[position] for position in positions]
+
+    def fields(self, table: MemoryTable) -> list:
+        return list(table.field_names)
+
+    def search_cursor(self, table: MemoryTable, fields: list):
+        return _ListCursor(self._rows(table, self._positions(table, fields)))
+
+    def update_cursor(self, table: MemoryTable, fields: list):
+        positions = self._positions(table, fields)
+        def save(row_id, values):
+            for position, value in zip(positions, values):
+                table.rows[row_id][position] = value
+        return _ListCursor(self._rows(table, positions), save, as_list=True)
+
+    def get_count(self, table: MemoryTable) -> int:
+        return len(table.rows) if table.selection is None else len(table.selection)
+
+    def selection_ids(self, table: MemoryTable):
+        return None if table.selection is None else set(table.selection)
+
+    def total_count(self, table: MemoryTable) -> int:
+        return len(table.rows)
+
+    def clear_selection(self, table: MemoryTable) -> None:
+        table.selection = None
+
+class _SQLiteUpdateCursor(_ListCursor):
+    def __init__(self, backend, table: str, fields: list, batch_size: int = 10000):
+        self._connection = backend.connection
+        assignments = ', '.join(f'"{field}" = ?' for field in fields)
+        self._sql = f'UPDATE "{table}" SET {assignments} WHERE rowid = ?'
+        self._pending = []
+        self._batch_size = batch_size
+        super().__init__(backend._rows(table, fields), self._queue, as_list=True)
+
+    def _queue(self, row_id, values) -> None:
+        self._pending.append((*values, row_id))
+        if len(self._pending) >= self._batch_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._pending:
+            self._connection.executemany(self._sql, self._pending)
+            self._pending = []
+
+    def close(self) -> None:
+        self._flush()
+        self._connection.commit()
+
+class SQLiteBackend(TableBackend):
+    '''
+    Backend for tables in a SQLite database (including GeoPackage attribute tables). Tables are passed to functions by name and record IDs are SQLite rowids.
+    `database`: Database path or an open `sqlite3.Connection`.
+    '''
+    def __init__(self, database):
+        self.connection = database if isinstance(database, sqlite3.Connection) else sqlite3.connect(database)
+        self._selections = {}
+
+    def select(self, table: str, where: str = None) -> None:
+        '''
+        Selects records matching a SQL where clause. `None` clears the selection.
+        '''
+        if where is None:
+            self._selections.pop(table, None)
+        else:
+            self._selections[table] = where
+
+    def _where(self, table: str) -> str:
+        where = self._selections.get(table)
+        return f' WHERE {where}' if where else ''
+
+    def _rows(self, table: str, fields: list):
+        if isinstance(fields, str):
+            fields = [fields]
+        columns = ', '.join(f'"{field}"' for field in fields)
+        query = self.connection.execute(f'SELECT rowid, {columns} FROM "{table}"{self._where(table)} ORDER BY rowid')
+        while True:
+            rows = query.fetchmany(10000)
+            if not rows:
+                return
+            for row in rows:
+                yield row[0], row[1:]
+
+    def fields(self, table: str) -> list:
+        return [row[1] for row in self.connection.execute(f'PRAGMA table_info("{table}")')]
+
+    def search_cursor(self, table: str, fields: list):
+        return _ListCursor(self._rows(table, fields))
+
+    def update_cursor(self, table: str, fields: list):
+        if isinstance(fields, str):
+            fields = [fields]
+        return _SQLiteUpdateCursor(self, table, fields)
+
+    def get_count(self, table: str) -> int:
+        return self.connection.execute(f'SELECT COUNT(*) FROM "{table}"{self._where(table)}').fetchone()[0]
+
+    def selection_ids(self, table: str):
+        if table not in self._selections:
+            return None
+        return {row[0] for row in self.connection.execute(f'SELECT rowid FROM "{table}"{self._where(table)}')}
+
+    def total_count(self, table: str) -> int:
+        return self.connection.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+
+    def clear_selection(self, table: str) -> None:
+        self._selections.pop(table, None)
+
+_default_backend = None
+
+def set_backend(backend: TableBackend) -> None:
+    '''
+    Sets the backend used by functions when no backend is passed to them.
+    `backend`: `TableBackend` to use. `None` resets the choice so it is made again on next use.
+    '''
+    global _default_backend
+    _default_backend = backend
+
+def get_backend() -> TableBackend:
+    '''
+    Returns the backend used by functions when no backend is passed to them, choosing it on first use.
+    The `DEBONAIR_BACKEND` environment variable selects the backend: `'arcpy'` (the default), `'memory'`, or `'sqlite:<database path>'`. arcpy itself is only imported once a table is accessed.
+    '''
+    global _default_backend
+    if _default_backend is None:
+        choice = os.environ.get('DEBONAIR_BACKEND', 'arcpy')
+        if choice == 'arcpy':
+            _default_backend = ArcpyBackend()
+        elif choice == 'memory':
+            _default_backend = MemoryBackend()
+        elif choice.startswith('sqlite:'):
+            _default_backend = SQLiteBackend(choice[len('sqlite:'):])
+        else:
+            raise ValueError(f'{choice} is not a valid value for DEBONAIR_BACKEND. Valid values are: "arcpy", "memory" and "sqlite:<database path>".')
+    return _default_backend
@@ -0,0 +1,42 @@
+import pytest
+import instrument
+from arcgis_rest import ArcGISRESTError, FeatureLayer
+from benchmarks.stand_ins import MockServer
+
+def test_query_returns_every_feature_past_max_record_count():
+    with MockServer(units=50, tracts_per_unit=5, max_record_count=40) as server, FeatureLayer(server.layer_url) as layer, instrument.EventLog() as log:
+        features = layer.query(out_fields=['OBJECTID', 'UNIT_CODE'])
+    assert [feature['attributes']['OBJECTID'] for feature in features] == list(range(1, 251))
+    assert [feature['attributes'] for feature in features] == server.features
+    query_events = [record for record in log.events if record['event'] == 'arcgis_rest.query']
+    assert query_events[0]['pages'] == 7
+
+def test_query_pages_ranges_larger_than_the_server_limit():
+    #Ranges of 100 IDs exceed the server's 40 record limit, so each is paged with resultOffset
+    with MockServer(units=50, tracts_per_unit=5, max_record_count=40) as server, FeatureLayer(server.layer_url, chunk_size=100) as layer:
+        features = layer.query(out_fields='*')
+    assert [feature['attributes'] for feature in features] == server.features
+
+def test_distinct_values_are_paged():
+    with MockServer(units=50, tracts_per_unit=5, max_record_count=40) as server, FeatureLayer(server.layer_url) as layer:
+        values = layer.values('UNIT_CODE', distinct=True)
+    assert values == server.units
+
+def test_distinct_queries_are_ordered():
+    with MockServer(units=5) as server, FeatureLayer(server.layer_url) as layer, instrument.EventLog() as log:
+        layer.values('UNIT_CODE', distinct=True)
+    distinct_urls = [record['url'] for record in log.events if record['event'] == 'http.request' and 'returnDistinctValues' in record['url']]
+    assert distinct_urls
+    assert all('orderByFields=UNIT_CODE' in url for url in distinct_urls)
+
+def test_paging_raises_when_the_layer_does_not_support_pagination():
+    with MockServer(units=50, tracts_per_unit=5, max_record_count=40, pagination=False) as server, FeatureLayer(server.layer_url) as layer:
+        with pytest.raises(ArcGISRESTError, match='does not support pagination'):
+            layer.values('UNIT_CODE', distinct=True)
+
+def test_paging_raises_when_a_page_repeats():
+    with MockServer(units=50, tracts_per_unit=5, max_record_count=40, pagination=False) as server, FeatureLayer(server.layer_url) as layer:
+        #Layer info without pagination capabilities, as returned by older servers
+        layer._info = {'maxRecordCount': 40}
+        with pytest.raises(ArcGISRESTError, match='same page'):
+            layer.values('UNIT_CODE', distinct=True)
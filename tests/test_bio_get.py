@@ -0,0 +1,29 @@
+import bio_get
+from benchmarks.stand_ins import MockServer
+
+def test_npsspp_v3_api_keeps_unit_order_and_reports_failures():
+    with MockServer(units=12, records_per_unit=3) as server:
+        units = server.units
+        #The first unit is slowest and one unit fails, so results arrive out of order
+        server.unit_delays[units[0]] = 0.2
+        server.failing_units.add(units[3])
+        failed = []
+        records = bio_get.npsspp_v3_api(units, max_workers=4, retries=0, failed_units=failed, base_url=server.npspecies_url)
+
+    expected_units = [unit for unit in units if unit != units[3]]
+    assert [record['UnitCode'] for record in records] == [unit for unit in expected_units for _ in range(3)]
+    assert [result.unit for result in failed] == [units[3]]
+    assert failed[0].status_code == 500
+    assert failed[0].records is None
+
+def test_npsspp_v3_units_yields_in_request_order():
+    with MockServer(units=8, records_per_unit=1) as server:
+        server.unit_delays[server.units[1]] = 0.1
+        results = list(bio_get.npsspp_v3_units(server.units, max_workers=8, base_url=server.npspecies_url))
+    assert [result.unit for result in results] == server.units
+    assert all(result.error is None for result in results)
+
+def test_nps_unit_list_returns_each_unit_once():
+    with MockServer(units=30, tracts_per_unit=4, max_record_count=7) as server:
+        units = bio_get.nps_unit_list(layer_url=server.layer_url)
+    assert units == server.units
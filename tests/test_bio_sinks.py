@@ -0,0 +1,107 @@
+import csv
+import json
+import sqlite3
+import pytest
+import bio_get
+from bio_sinks import CSVSink, NDJSONSink, SQLiteSink
+from benchmarks.stand_ins import MockServer
+
+RECORDS = {'AAAA': [{'SciName': 'Taxon 1', 'Count': 1}, {'SciName': 'Taxon 2', 'Count': 2}],
+           'AAAB': [{'SciName': 'Taxon 3', 'Count': 3}]}
+
+def _interrupt(sink) -> None:
+    #Imitates a crash partway through a unit: data is written but the unit is never logged as completed
+    sink._file.write('partial unit data')
+    sink._file.flush()
+    sink.close()
+
+def _read_ndjson(path) -> list:
+    with open(path, encoding='utf-8') as data_file:
+        return [json.loads(line) for line in data_file]
+
+def _read_csv(path) -> list:
+    with open(path, newline='', encoding='utf-8') as data_file:
+        return list(csv.DictReader(data_file))
+
+def test_ndjson_sink_resumes_after_interruption(tmp_path):
+    path = str(tmp_path / 'records.ndjson')
+    sink = NDJSONSink(path)
+    sink.write('AAAA', RECORDS['AAAA'])
+    _interrupt(sink)
+
+    with NDJSONSink(path) as sink:
+        assert sink.completed_units == {'AAAA'}
+        sink.write('AAAB', RECORDS['AAAB'])
+    expected = [{'UnitCode': unit, **record} for unit, records in RECORDS.items() for record in records]
+    assert _read_ndjson(path) == expected
+
+def test_csv_sink_resumes_with_existing_header(tmp_path):
+    path = str(tmp_path / 'records.csv')
+    sink = CSVSink(path)
+    sink.write('AAAA', RECORDS['AAAA'])
+    _interrupt(sink)
+
+    with CSVSink(path) as sink:
+        assert sink.completed_units == {'AAAA'}
+        sink.write('AAAB', RECORDS['AAAB'])
+    rows = _read_csv(path)
+    assert [row['UnitCode'] for row in rows] == ['AAAA', 'AAAA', 'AAAB']
+    assert [row['Count'] for row in rows] == ['1', '2', '3']
+
+def test_csv_sink_rejects_fields_missing_from_header(tmp_path):
+    path = str(tmp_path / 'records.csv')
+    with CSVSink(path) as sink:
+        sink.write('AAAA', RECORDS['AAAA'])
+        with pytest.raises(ValueError, match='Extra'):
+            sink.write('AAAB', [{'SciName': 'Taxon 3', 'Count': 3, 'Extra': 'x'}])
+        assert sink.completed_units == {'AAAA'}
+    assert len(_read_csv(path)) == 2
+
+def test_csv_sink_writes_given_fieldnames(tmp_path):
+    path = str(tmp_path / 'records.csv')
+    with CSVSink(path, fieldnames=['UnitCode', 'SciName', 'Count', 'Extra']) as sink:
+        sink.write('AAAA', RECORDS['AAAA'])
+        sink.write('AAAB', [{'SciName': 'Taxon 3', 'Count': 3, 'Extra': 'x'}])
+    assert [row['Extra'] for row in _read_csv(path)] == ['', '', 'x']
+
+def test_sqlite_sink_rolls_back_an_interrupted_unit(tmp_path):
+    path = str(tmp_path / 'records.sqlite')
+    sink = SQLiteSink(path)
+    sink.write('AAAA', RECORDS['AAAA'])
+    #A value SQLite cannot store fails the insert partway through the unit's transaction
+    with pytest.raises(sqlite3.Error):
+        sink.write('AAAB', [{'SciName': 'Taxon 3', 'Count': 3}, {'SciName': object(), 'Count': 4}])
+    sink.close()
+
+    with SQLiteSink(path) as sink:
+        assert sink.completed_units == {'AAAA'}
+        sink.write('AAAB', RECORDS['AAAB'])
+        rows = sink.connection.execute('SELECT UnitCode, SciName, Count FROM npspecies ORDER BY rowid').fetchall()
+    assert rows == [('AAAA', 'Taxon 1', 1), ('AAAA', 'Taxon 2', 2), ('AAAB', 'Taxon 3', 3)]
+
+@pytest.mark.parametrize('sink_type', ['ndjson', 'sqlite'])
+def test_npsspp_v3_to_sink_only_requests_missing_units_when_resumed(tmp_path, sink_type):
+    def open_sink():
+        if sink_type == 'ndjson':
+            return NDJSONSink(str(tmp_path / 'records.ndjson'), unit_field=None)
+        return SQLiteSink(str(tmp_path / 'records.sqlite'), unit_field=None)
+
+    with MockServer(units=6, records_per_unit=2) as server:
+        server.failing_units.add(server.units[2])
+        with open_sink() as sink:
+            failures = bio_get.npsspp_v3_to_sink(sink, server.units, max_workers=3, retries=0, base_url=server.npspecies_url)
+        assert [result.unit for result in failures] == [server.units[2]]
+
+        server.failing_units.clear()
+        requests_before = server.requests
+        with open_sink() as sink:
+            failures = bio_get.npsspp_v3_to_sink(sink, server.units, max_workers=3, retries=0, base_url=server.npspecies_url)
+            assert failures == []
+            assert sink.completed_units == set(server.units)
+            if sink_type == 'sqlite':
+                units = [row[0] for row in sink.connection.execute('SELECT UnitCode FROM npspecies')]
+        assert server.requests - requests_before == 1
+
+    if sink_type == 'ndjson':
+        units = [record['UnitCode'] for record in _read_ndjson(str(tmp_path / 'records.ndjson'))]
+    assert sorted(units) == sorted(unit for unit in server.units for _ in range(2))
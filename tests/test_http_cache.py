@@ -0,0 +1,46 @@
+import pytest
+from http_cache import CacheMissError, HTTPCache
+from http_util import http_session
+from benchmarks.stand_ins import MockServer
+
+@pytest.fixture
+def server():
+    with MockServer(units=2, records_per_unit=2) as mock_server:
+        yield mock_server
+
+def _unit_url(server) -> str:
+    return server.npspecies_url + 'checklist/' + server.units[0]
+
+def test_fresh_response_is_served_from_cache(server):
+    cache = HTTPCache(':memory:')
+    with http_session(1) as session:
+        first = cache.get(session, _unit_url(server))
+        second = cache.get(session, _unit_url(server))
+    assert server.requests == 1
+    assert getattr(first, 'from_cache', False) is False
+    assert second.from_cache is True
+    assert second.json() == first.json()
+
+def test_stale_response_is_revalidated_with_etag(server):
+    cache = HTTPCache(':memory:', default_ttl=0)
+    with http_session(1) as session:
+        first = cache.get(session, _unit_url(server))
+        second = cache.get(session, _unit_url(server))
+    assert server.requests == 2
+    assert server.statuses[304] == 1
+    assert second.from_cache is True
+    assert second.json() == first.json()
+
+def test_offline_cache_serves_stored_responses_and_raises_on_miss(server, tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    with http_session(1) as session:
+        online = HTTPCache(path, default_ttl=0)
+        expected = online.get(session, _unit_url(server)).json()
+        online.close()
+
+        offline = HTTPCache(path, default_ttl=0, offline=True)
+        assert offline.get(session, _unit_url(server)).json() == expected
+        with pytest.raises(CacheMissError):
+            offline.get(session, server.npspecies_url + 'checklist/' + server.units[1])
+        offline.close()
+    assert server.requests == 1
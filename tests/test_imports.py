@@ -0,0 +1,19 @@
+import json
+import subprocess
+import sys
+from conftest import ROOT
+
+MODULES = ['bio_get', 'UNTESTED', 'UNTESTED2', 'transfer_attrib', 'geo_util']
+
+#Generous limit for slow machines; without arcpy these imports take well under 200 ms
+IMPORT_TIME_LIMIT = 2.0
+
+def test_import_does_not_load_arcpy():
+    code = ('import json, sys, time\n'
+            'start = time.perf_counter()\n'
+            f'import {", ".join(MODULES)}\n'
+            'print(json.dumps({"seconds": time.perf_counter() - start, "arcpy": "arcpy" in sys.modules}))')
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    timing = json.loads(result.stdout.strip().splitlines()[-1])
+    assert timing['arcpy'] is False
+    assert timing['seconds'] < IMPORT_TIME_LIMIT
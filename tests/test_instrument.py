@@ -0,0 +1,34 @@
+import pytest
+import bio_get
+import instrument
+from benchmarks.stand_ins import MockServer
+
+def _failing_hook(record: dict) -> None:
+    raise ValueError('hook failed')
+
+@pytest.fixture
+def failing_hook():
+    instrument.add_hook(_failing_hook)
+    yield _failing_hook
+    instrument.remove_hook(_failing_hook)
+
+def test_failing_hook_is_warned_and_other_hooks_still_run(failing_hook):
+    with instrument.EventLog() as log, pytest.warns(RuntimeWarning, match='ValueError for "test.event" event: hook failed'):
+        instrument.emit('test.event', value=1)
+    assert [(record['event'], record['value']) for record in log.events] == [('test.event', 1)]
+
+def test_failing_hook_does_not_break_requests(failing_hook):
+    with MockServer(units=3, records_per_unit=2) as server, pytest.warns(RuntimeWarning, match='hook failed'):
+        failed = []
+        records = bio_get.npsspp_v3_api(server.units, retries=0, failed_units=failed, base_url=server.npspecies_url)
+    assert failed == []
+    assert len(records) == 6
+
+def test_timed_emits_fields_added_in_block():
+    with instrument.EventLog() as log:
+        with instrument.timed('test.timed', before=1) as event:
+            event['after'] = 2
+    record = log.events[0]
+    assert (record['event'], record['before'], record['after']) == ('test.timed', 1, 2)
+    assert record['seconds'] >= 0
+    assert not instrument.active()
@@ -0,0 +1,80 @@
+import json
+import pytest
+import instrument
+import UNTESTED2
+from benchmarks.stand_ins import FakeGIS, FakeItem
+
+def test_portal_search_all_returns_every_item_past_the_search_limit():
+    gis = FakeGIS(25000, owners=3)
+    stats = {}
+    items = UNTESTED2.portal_search_all(gis, 'NOT owner:esri*', stats=stats)
+    assert [item.id for item in items] == sorted(item.id for item in gis.items)
+    assert stats['items'] == 25000
+    assert stats['missed_items'] == 0
+
+def test_portal_search_all_splits_large_owners_by_type():
+    gis = FakeGIS(12000, owners=1)
+    stats = {}
+    items = UNTESTED2.portal_search_all(gis, 'NOT owner:esri*', shard_types=['Feature Service', 'Web Map', 'Web Mapping Application', 'PDF', 'CSV'], stats=stats)
+    assert len(items) == 12000
+    assert stats['shards'] == 5
+    assert stats['missed_items'] == 0
+
+def test_portal_search_all_warns_about_owners_missing_from_user_search():
+    gis = FakeGIS(30000, owners=3, listed_owners=2)
+    stats = {}
+    with pytest.warns(UserWarning, match='Only 20000 of 30000 items'):
+        items = UNTESTED2.portal_search_all(gis, 'NOT owner:esri*', stats=stats)
+    assert len(items) == 20000
+    assert stats['missed_items'] == 10000
+
+def test_portal_tag_list_counts_match_for_items_and_index():
+    gis = FakeGIS(200, tags=20)
+    gis.items[0].tags = ['Tag 0', 'Tag 0', 'Tag 5']
+    assert UNTESTED2.portal_tag_list(gis.items) == UNTESTED2.portal_tag_list(UNTESTED2.TagIndex(gis.items))
+
+def test_portal_tag_update_with_index_only_updates_changed_items():
+    gis = FakeGIS(200, tags=20)
+    index = UNTESTED2.TagIndex(gis.items)
+    tag_dict = UNTESTED2.portal_tag_update(gis.items, {'Tag 3': 'tag three'}, update=True, index=index, backoff=0)
+    assert tag_dict['Status'].count('Updated') == len(tag_dict['Item ID']) == 30
+    assert index.items_with('Tag 3') == set()
+    assert len(index.items_with('tag three')) == 30
+    assert all('Tag 3' not in item.tags for item in gis.items)
+
+class _FailingItem(FakeItem):
+    def __init__(self, *args, failures: int = 0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failures = failures
+        self.attempts = 0
+
+    def update(self, item_properties: dict) -> bool:
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise ConnectionError('connection reset')
+        return super().update(item_properties)
+
+def _journal_ids(path) -> list:
+    with open(path, encoding='utf-8') as journal_file:
+        return [json.loads(line)['id'] for line in journal_file]
+
+def test_portal_tag_update_journal_skips_completed_and_retries_failed_items(tmp_path):
+    journal = str(tmp_path / 'journal.ndjson')
+    #Item 1 fails every attempt in the first run, item 2 succeeds on its second attempt
+    items = [_FailingItem(f'item{index}', 'owner', 'PDF', ['old'], failures=failures) for index, failures in enumerate([0, 10, 1])]
+    tag_dict = UNTESTED2.portal_tag_update(items, {'old': 'new'}, update=True, retries=1, backoff=0, max_workers=1, journal=journal)
+    assert tag_dict['Status'] == ['Updated', 'Failed (ConnectionError: connection reset)', 'Updated']
+    assert [item.attempts for item in items] == [1, 2, 2]
+    assert _journal_ids(journal) == ['item0', 'item2']
+
+    #Items are re-read with their old tags, as if the first run had been interrupted before they were refreshed
+    for item in items:
+        item.tags = ['old']
+    items[1].failures = 0
+    with instrument.EventLog() as log:
+        tag_dict = UNTESTED2.portal_tag_update(items, {'old': 'new'}, update=True, retries=1, backoff=0, max_workers=1, journal=journal)
+    assert tag_dict['Status'] == ['Skipped (in journal)', 'Updated', 'Skipped (in journal)']
+    assert [item.attempts for item in items] == [1, 3, 2]
+    assert _journal_ids(journal) == ['item0', 'item2', 'item1']
+    event = [record for record in log.events if record['event'] == 'portal.tag_update'][0]
+    assert (event['changed'], event['skipped'], event['updated'], event['failed']) == (3, 2, 1, 0)
@@ -0,0 +1,77 @@
+import itertools
+import random
+import pytest
+from presence import PresenceMatrix
+from species_table import SpeciesTable
+
+def _random_parks(rng, parks: int = 12, taxa: int = 300) -> dict:
+    taxa_by_park = {}
+    for index in range(parks):
+        size = rng.randrange(0, taxa // 2) if index else 0
+        taxa_by_park[f'P{index:03d}'] = rng.sample([f'Taxon {taxon}' for taxon in range(taxa)], size)
+    return taxa_by_park
+
+def _brute_similarity(a: set, b: set, method: str) -> float:
+    if method == 'jaccard':
+        return len(a & b) / len(a | b) if a | b else 0.0
+    return 2 * len(a & b) / (len(a) + len(b)) if a or b else 0.0
+
+def test_set_operations_match_brute_force():
+    rng = random.Random(0)
+    taxa_by_park = _random_parks(rng)
+    sets = {park: set(taxa) for park, taxa in taxa_by_park.items()}
+    matrix = PresenceMatrix(taxa_by_park)
+    parks = list(sets)
+    assert matrix.parks == parks
+    for park in parks:
+        assert sorted(matrix.taxa_in(park)) == sorted(sets[park])
+        assert matrix.count(park) == len(sets[park])
+        others = set().union(*(sets[other] for other in parks if other != park))
+        assert sorted(matrix.only_in(park)) == sorted(sets[park] - others)
+    for _ in range(50):
+        group = rng.sample(parks, rng.randrange(2, 5))
+        assert sorted(matrix.shared(*group)) == sorted(set.intersection(*(sets[park] for park in group)))
+        assert sorted(matrix.union(*group)) == sorted(set.union(*(sets[park] for park in group)))
+        assert sorted(matrix.only_in(*group)) == sorted(sets[group[0]] - set().union(*(sets[park] for park in group[1:])))
+    for taxon in ['Taxon 0', 'Taxon 150', 'Taxon 299', 'Not a taxon']:
+        assert matrix.parks_with(taxon) == [park for park in parks if taxon in sets[park]]
+
+@pytest.mark.parametrize('method', ['jaccard', 'sorensen'])
+def test_similarity_matches_brute_force(method):
+    rng = random.Random(1)
+    taxa_by_park = _random_parks(rng)
+    sets = {park: set(taxa) for park, taxa in taxa_by_park.items()}
+    matrix = PresenceMatrix(taxa_by_park)
+    parks, values = matrix.similarity_matrix(method)
+    for (i, a), (j, b) in itertools.product(enumerate(parks), repeat=2):
+        expected = _brute_similarity(sets[a], sets[b], method)
+        assert matrix.similarity(a, b, method) == pytest.approx(expected)
+        assert values[i][j] == pytest.approx(expected)
+    with pytest.raises(ValueError):
+        matrix.similarity(parks[0], parks[1], 'cosine')
+
+def test_update_park_replaces_taxa():
+    rng = random.Random(2)
+    taxa_by_park = _random_parks(rng, parks=4)
+    matrix = PresenceMatrix(taxa_by_park)
+    removed = taxa_by_park['P001'][:5]
+    taxa_by_park['P001'] = taxa_by_park['P001'][5:] + ['New taxon']
+    matrix.update_park('P001', taxa_by_park['P001'])
+    assert sorted(matrix.taxa_in('P001')) == sorted(set(taxa_by_park['P001']))
+    assert matrix.count('P001') == len(set(taxa_by_park['P001']))
+    assert matrix.parks_with('New taxon') == ['P001']
+    for taxon in removed:
+        assert matrix.parks_with(taxon) == [park for park, taxa in taxa_by_park.items() if taxon in taxa]
+    matrix.remove_park('P001')
+    assert 'P001' not in matrix and len(matrix) == 3
+    assert matrix.parks_with('New taxon') == []
+
+def test_from_records_matches_table_and_list():
+    rng = random.Random(3)
+    records = [{'UnitCode': f'P{rng.randrange(5)}', 'SciName': f'Taxon {rng.randrange(40)}'} for _ in range(500)]
+    from_list = PresenceMatrix.from_records(records)
+    from_table = PresenceMatrix.from_records(SpeciesTable(records))
+    assert sorted(from_list.parks) == sorted(from_table.parks)
+    for park in from_list.parks:
+        expected = sorted({record['SciName'] for record in records if record['UnitCode'] == park})
+        assert sorted(from_list.taxa_in(park)) == sorted(from_table.taxa_in(park)) == expected
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from spatial_index import EnvelopeIndex
+
+def _random_bounds(rng, count: int) -> np.ndarray:
+    corners = rng.uniform(0, 1000, (count, 2))
+    sizes = rng.uniform(0, 30, (count, 2))
+    return np.column_stack([corners, corners + sizes])
+
+def _brute_force(ids, bounds, bbox, predicate: str) -> list:
+    xmin, ymin, xmax, ymax = bbox
+    if predicate == 'intersects':
+        match = (bounds[:, 0] <= xmax) & (bounds[:, 2] >= xmin) & (bounds[:, 1] <= ymax) & (bounds[:, 3] >= ymin)
+    else:
+        match = (bounds[:, 0] >= xmin) & (bounds[:, 2] <= xmax) & (bounds[:, 1] >= ymin) & (bounds[:, 3] <= ymax)
+    return sorted(np.asarray(ids)[match].tolist())
+
+@pytest.mark.parametrize('predicate', ['intersects', 'within'])
+def test_query_matches_brute_force(predicate):
+    rng = np.random.default_rng(0)
+    ids = np.arange(1, 2001)
+    bounds = _random_bounds(rng, len(ids))
+    index = EnvelopeIndex(ids, bounds, node_capacity=8)
+    for bbox in _random_bounds(rng, 50) + [0, 0, 150, 150]:
+        assert sorted(index.query(bbox, predicate).tolist()) == _brute_force(ids, bounds, bbox, predicate)
+
+def test_query_matches_brute_force_after_updates_and_removals():
+    rng = np.random.default_rng(1)
+    ids = np.arange(1, 1001)
+    bounds = _random_bounds(rng, len(ids))
+    #A high rebuild ratio keeps changes in the pending set instead of the tree
+    index = EnvelopeIndex(ids, bounds, rebuild_ratio=0.5)
+    moved = ids[:50]
+    bounds[:50] = _random_bounds(rng, 50)
+    index.update(moved, bounds[:50])
+    new_ids = np.arange(1001, 1051)
+    new_bounds = _random_bounds(rng, 50)
+    index.update(new_ids, new_bounds)
+    removed = ids[100:150]
+    index.remove(removed)
+
+    keep = ~np.isin(ids, removed)
+    all_ids = np.concatenate([ids[keep], new_ids])
+    all_bounds = np.concatenate([bounds[keep], new_bounds])
+    assert len(index) == len(all_ids)
+    for bbox in _random_bounds(rng, 50) + [0, 0, 100, 100]:
+        assert sorted(index.query(bbox).tolist()) == _brute_force(all_ids, all_bounds, bbox, 'intersects')
+
+def test_extents_match_brute_force():
+    rng = np.random.default_rng(2)
+    ids = np.arange(1, 301)
+    bounds = _random_bounds(rng, len(ids))
+    index = EnvelopeIndex(ids, bounds)
+    groups = [[1, 2, 3], [], [300], list(range(50, 120))]
+    result = index.extents(groups)
+    for group, row in zip(groups, result):
+        if not group:
+            assert np.isnan(row).all()
+            continue
+        group_bounds = bounds[np.asarray(group) - 1]
+        assert row.tolist() == [*group_bounds[:, :2].min(axis=0), *group_bounds[:, 2:].max(axis=0)]
+        assert index.extent(group) == tuple(row.tolist())
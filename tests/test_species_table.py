@@ -0,0 +1,59 @@
+import random
+import pytest
+from species_table import SpeciesTable
+
+def _records(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    records = []
+    for index in range(count):
+        record = {'SciName': f'Taxon {rng.randrange(50)}',
+                  'Category': rng.choice(['Bird', 'Mammal', 'Fish']),
+                  'TaxonCode': rng.randrange(10**6),
+                  'Abundance': rng.random()}
+        if index % 7 == 0:
+            record['TaxonCode'] = None
+        if index % 11 == 0:
+            record['Abundance'] = None
+        records.append(record)
+    return records
+
+@pytest.mark.parametrize('values', [[1, None, 3], [None, 2.5, 1], [1, 2.5, 2**60], [True, 1, 1.0, 'a'], [[1], None, 'a']])
+def test_records_round_trip(values):
+    records = [{'Value': value} for value in values]
+    result = SpeciesTable(records).to_records()
+    assert result == records
+    assert [type(record['Value']) for record in result] == [type(value) for value in values]
+
+def test_numeric_columns_stay_typed_with_nulls():
+    records = _records(1000)
+    records.append({'Abundance': 3})
+    table = SpeciesTable(records)
+    assert table._columns['TaxonCode'].kind == 'int'
+    assert table._columns['Abundance'].kind == 'float'
+    #8 bytes per value plus 1 byte null flag (and 1 byte integer flag for 'Abundance')
+    assert table._columns['TaxonCode'].nbytes() == 1001 * 9
+    assert table._columns['Abundance'].nbytes() == 1001 * 10
+    assert table.to_records()[-1] == {'SciName': None, 'Category': None, 'TaxonCode': None, 'Abundance': 3}
+
+def test_filter_and_groupby_match_records():
+    records = _records(500)
+    table = SpeciesTable(records)
+    for conditions in [{'Category': 'Bird'}, {'Category': ['Fish', 'Mammal'], 'TaxonCode': None}, {'Abundance': None}, {'Missing': 1}]:
+        expected = [record for record in records if all(record.get(name) in (values if isinstance(values, list) else [values]) for name, values in conditions.items())]
+        assert table.filter(**conditions).to_records() == expected
+    for name in ['SciName', 'TaxonCode']:
+        expected = {}
+        for index, record in enumerate(records):
+            expected.setdefault(record[name], []).append(index)
+        assert {value: list(rows) for value, rows in table.groupby(name).items()} == expected
+
+def test_appending_to_filtered_table_leaves_parent_unchanged():
+    table = SpeciesTable(_records(100))
+    categories = table.categories('Category')
+    birds = table.filter(Category='Bird')
+    birds.append([{'Category': 'Reptile', 'TaxonCode': 1}])
+    assert table.categories('Category') == categories
+    assert 'Reptile' in birds.categories('Category')
+    assert birds.to_records()[-1]['Category'] == 'Reptile'
+    table.append([{'Category': 'Amphibian'}])
+    assert 'Amphibian' not in birds.categories('Category')
@@ -0,0 +1,81 @@
+import pytest
+import UNTESTED
+from table_backend import MemoryBackend, MemoryTable
+from transfer_attrib import EditSession
+from benchmarks.stand_ins import key_tables, selection_tables
+
+FIELDS = ['FIELD0', 'FIELD1']
+
+@pytest.mark.parametrize('chunk_size', [None, 1, 7, 80, 1000])
+def test_join_update_matches_keys_across_chunks(chunk_size):
+    source, target = key_tables(100, fields=2, matches=0.8)
+    updated = UNTESTED.join_update(source, target, FIELDS, FIELDS, 'KEY', chunk_size=chunk_size, backend=MemoryBackend())
+    assert updated == 80
+    for row in target.rows:
+        if row[0] >= 0:
+            assert row == source.rows[row[0]]
+        else:
+            assert row[1:] == [None, None]
+
+def test_join_update_rejects_repeated_keys_when_unique():
+    source = MemoryTable(['KEY', 'FIELD0'], [[1, 'a'], [1, 'b']])
+    target = MemoryTable(['KEY', 'FIELD0'], [[1, None]])
+    with pytest.raises(Exception, match='repeated'):
+        UNTESTED.join_update(source, target, ['FIELD0'], ['FIELD0'], 'KEY', unique=True, backend=MemoryBackend())
+
+@pytest.mark.parametrize('chunk_size', [None, 2])
+def test_update_records_from_keyed_uses_last_repeated_key(chunk_size):
+    source = MemoryTable(['KEY', 'FIELD0'], [[1, 'a'], [2, 'b'], [1, 'c']])
+    target = MemoryTable(['KEY', 'FIELD0'], [[2, None], [1, None], [3, None]])
+    updated = UNTESTED.update_records_from(source, target, ['FIELD0'], 'm:m', key_field='KEY', chunk_size=chunk_size, backend=MemoryBackend())
+    assert target.rows == [[2, 'b'], [1, 'c'], [3, None]]
+    if chunk_size is None:
+        assert updated == 2
+
+def test_edit_session_writes_queued_edits_on_commit():
+    backend = MemoryBackend()
+    in_table, out_table = selection_tables(10, fields=3)
+    session = EditSession(backend)
+    session.transfer(in_table, out_table, ['FIELD0', 'FIELD1'])
+    session.replace(out_table, 'FIELD2', 'replaced')
+    assert out_table.rows[9] == [None, None, None]
+
+    session.commit()
+    assert out_table.rows[9] == ['value 0 0', 'value 0 1', 'replaced']
+    assert all(row == [None, None, None] for row in out_table.rows[:9])
+    assert in_table.selection is None and out_table.selection is None
+
+def test_edit_session_discards_edits_on_error():
+    backend = MemoryBackend()
+    in_table, out_table = selection_tables(10, fields=1)
+    with pytest.raises(RuntimeError):
+        with EditSession(backend) as session:
+            session.transfer(in_table, out_table, 'FIELD0')
+            raise RuntimeError()
+    assert out_table.rows[9] == [None]
+
+def test_edit_session_accepts_one_record_table_with_its_record_selected():
+    backend = MemoryBackend()
+    in_table = MemoryTable(['FIELD0'], [['only']])
+    in_table.select([0])
+    _, out_table = selection_tables(5, fields=1)
+    with EditSession(backend) as session:
+        session.transfer(in_table, out_table, 'FIELD0')
+    assert out_table.rows[4] == ['only']
+
+@pytest.mark.parametrize('selection', [None, [], [0, 1], [0, 1, 2]])
+def test_update_records_from_one_to_many_requires_one_selected_record(selection):
+    source = MemoryTable(['FIELD0'], [['a'], ['b'], ['c']])
+    target = MemoryTable(['FIELD0'], [[None], [None]])
+    if selection is not None:
+        source.select(selection)
+    with pytest.raises(Exception, match='Exactly 1 record'):
+        UNTESTED.update_records_from(source, target, ['FIELD0'], '1:m', backend=MemoryBackend())
+    assert target.rows == [[None], [None]]
+
+def test_update_records_from_one_to_many_copies_selected_record():
+    source = MemoryTable(['FIELD0'], [['a'], ['b'], ['c']])
+    target = MemoryTable(['FIELD0'], [[None], [None]])
+    source.select([1])
+    assert UNTESTED.update_records_from(source, target, ['FIELD0'], '1:m', backend=MemoryBackend()) == 2
+    assert target.rows == [['b'], ['b']]
@@ -1,20 +1,190 @@
-def selection_count(table) -> int:
+from collections import namedtuple
+import time
+import instrument
+from lazy_import import arcpy
+from table_backend import TableBackend, get_backend
+
+def selection_count(table, backend: TableBackend = None) -> int:
     '''
     Returns a count of the number of records selected in a table. Returns -1 if all records in a table are selected.
     `Table`: Table with records to be counted.
+    `backend`: `TableBackend` used to access the table.
+        Default: `None`, `table_backend.get_backend()`
+    '''
+    if backend is None:
+        backend = get_backend()
+    return backend.selection_count(table)
+
+#Queued value read from a field of another table when an `EditSession` is committed
+_Source = namedtuple('_Source', ['table', 'field'])
+
+class EditSession:
     '''
-    if arcpy.Describe(table).FIDSet:
-        records = arcpy.GetCount_management(table)
-        count = int(records.getOutput(0))
-        if count == '''ACTUAL FULL RECORD COUNT''': # <---- Figure out
-            return -1
-        return count
-    else:
-        return 0
-
-def transfer_attributes(in_table, out_table, in_fields = list|str, out_fields: list|str = None, reset_selection: bool = True, max_selection: int = 1) -> None:
+    Queues replace, clear and transfer edits across tables and fields, then applies them on `commit` with one UpdateCursor pass per table.
+    Selection counts are cached for the life of the session, so checking several edits against the same selection only describes each table once. Used as a context manager, edits are committed when the block exits without an error and discarded otherwise.
+    `backend`: `TableBackend` used to access the tables.
+        Default: `None`, `table_backend.get_backend()`
+    `reset_selection`: If the selections of edited tables should be reset after committing.
+        Default: `True`
+    '''
+    def __init__(self, backend: TableBackend = None, reset_selection: bool = True):
+        self.backend = backend if backend is not None else get_backend()
+        self.reset_selection = reset_selection
+        self._edits = {}
+        self._tables = {}
+        self._sources = {}
+        self._selections = {}
+        self._counts = {}
+
+    def _key(self, table):
+        #Tables can be unhashable objects (such as `MemoryTable`), so they are tracked by id
+        self._tables[id(table)] = table
+        return id(table)
+
+    def selection_ids(self, table):
+        '''
+        Returns the cached set of selected record IDs (FID set) of a table, or `None` if it has no selection.
+        `table`: Table to describe.
+        '''
+        key = self._key(table)
+        if key not in self._selections:
+            self._selections[key] = self.backend.selection_ids(table)
+        return self._selections[key]
+
+    def selection_count(self, table) -> int:
+        '''
+        Returns the cached selection count of a table (see `selection_count`).
+        `table`: Table with records to be counted.
+        '''
+        key = self._key(table)
+        if key not in self._counts:
+            selected = self.selection_ids(table)
+            if not selected:
+                self._counts[key] = 0
+            elif len(selected) == self.backend.total_count(table):
+                self._counts[key] = -1
+            else:
+                self._counts[key] = len(selected)
+        return self._counts[key]
+
+    def _check_selection(self, table, max_selection: int, message: str) -> None:
+        if self.selection_count(table) == 0:
+            raise Exception('No output record(s) selected.')
+        if len(self.selection_ids(table)) > max_selection:
+            raise Exception(message)
+
+    def _queue(self, table, fields: list, values: list) -> None:
+        edits = self._edits.setdefault(self._key(table), {})
+        for field, value in zip(fields, values):
+            edits.pop(field, None)
+            edits[field] = value
+
+    def replace(self, table, fields: list|str, replace_value = None, max_selection: int = 1) -> None:
+        '''
+        Queues replacing the values of fields in the selected records of a table.
+        `table`: Table to update.
+        `fields`: List of fields to replace attributes of. A string can also be used for a single field.
+        `replace_value`: Value to replace attributes with.
+            Default: `None`
+        `max_selection`: Maximum number of records that can be selected in the table.
+            Default: `1`
+        '''
+        if isinstance(fields, str):
+            fields = [fields]
+        self._check_selection(table, max_selection, 'Number of records selected in table exceeds max_selection.')
+        self._queue(table, fields, [replace_value] * len(fields))
+
+    def clear(self, table, fields: list|str, max_selection: int = 1) -> None:
+        '''
+        Queues clearing (setting to <Null>) fields in the selected records of a table.
+        `table`: Table to update.
+        `fields`: List of fields to clear. A string can also be used for a single field.
+        `max_selection`: Maximum number of records that can be selected in the table.
+            Default: `1`
+        '''
+        self.replace(table, fields, None, max_selection)
+
+    def transfer(self, in_table, out_table, in_fields: list|str, out_fields: list|str = None, max_selection: int = 1) -> None:
+        '''
+        Queues copying fields from the selected record of one table to the selected record(s) of another. Input values are read when the session is committed, before any edits are written.
+        `in_table`: Input table to copy records from.
+        `out_table`: Output table to copy attributes to.
+        `in_fields`: List of fields in the input table to copy. A string can also be used for a single field.
+        `out_fields`: List of fields in the output table to copy to. If no fields are provided, `in_fields` is used.
+            Default: `None`
+        `max_selection`: Maximum number of records that can be selected in the output table.
+            Default: `1`
+        '''
+        if isinstance(in_fields, str):
+            in_fields = [in_fields]
+        if isinstance(out_fields, str):
+            out_fields = [out_fields]
+        if out_fields is None:
+            out_fields = in_fields
+        #A one record table with its record selected counts as -1 (all selected), so the FID set is checked directly
+        if len(self.selection_ids(in_table) or ()) != 1:
+            raise Exception('More than one record selected in input table.')
+        self._check_selection(out_table, max_selection, 'Number of records selected in out table exceeds max_out_selection.')
+        if len(in_fields) != len(out_fields):
+            raise Exception(f'Cannot match fields one-to-one, a different number of fields was specified for input and output.\n Input: {len(in_fields)}, Output: {len(out_fields)}.')
+        fields = self._sources.setdefault(self._key(in_table), [])
+        fields.extend(field for field in in_fields if field not in fields)
+        self._queue(out_table, out_fields, [_Source(self._key(in_table), field) for field in in_fields])
+        self._key(out_table)
+
+    def commit(self) -> None:
+        '''
+        Writes all queued edits, one UpdateCursor pass per table, then clears the queue and the cached selections.
+        '''
+        start_time = time.perf_counter()
+        rows = 0
+        #Read transfer values
+        source_values = {}
+        for key, fields in self._sources.items():
+            with self.backend.search_cursor(self._tables[key], fields) as search_cursor:
+                row = next(search_cursor)
+            for field, value in zip(fields, row):
+                source_values[(key, field)] = value
+
+        #Write edits
+        for key, edits in self._edits.items():
+            fields = list(edits)
+            values = [source_values[value] if isinstance(value, _Source) else value for value in edits.values()]
+            with self.backend.update_cursor(self._tables[key], fields) as update_cursor:
+                for row in update_cursor:
+                    update_cursor.updateRow(values)
+                    rows += 1
+        instrument.emit('table.edit_commit', tables=len(self._edits), fields=sum(len(edits) for edits in self._edits.values()), rows=rows, seconds=time.perf_counter() - start_time)
+
+        #Reset Selection
+        if self.reset_selection is True:
+            for table in self._tables.values():
+                self.backend.clear_selection(table)
+        self.discard()
+
+    def discard(self) -> None:
+        '''
+        Clears queued edits and cached selections without writing anything.
+        '''
+        self._edits.clear()
+        self._tables.clear()
+        self._sources.clear()
+        self._selections.clear()
+        self._counts.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+
+def transfer_attributes(in_table, out_table, in_fields = list|str, out_fields: list|str = None, reset_selection: bool = True, max_selection: int = 1, backend: TableBackend = None) -> None:
     '''
     Transfers attributes from a selected record in one table to selected record(s) in another. Acts in a 1-m relationship.
+    To make several edits at once, use an `EditSession`.
     `in_table`: Input table to copy records from.
     `out_table`: Output table to copy attributes to.
     `in_fields`: List of fields in the input table to copy. A string can also be used for a single field.
@@ -24,44 +194,16 @@ def transfer_attributes(in_table, out_table, in_fields = list|str, out_fields: l
         Default: `True`
     `max_out_selection`: Maximum number of records that can be selected in the output table.
         Default: `1`
+    `backend`: `TableBackend` used to access the tables.
+        Default: `None`, `table_backend.get_backend()`
     '''
-    #If no out_field, assign in_field
-    if isinstance(in_fields, str):
-        in_fields = list(in_fields)
-    
-    if out_fields is None:
-        out_fields = in_fields
-
-    #Check Selection Count and Field Lists
-    if selection_count(in_table) != 1:
-        raise Exception('More than one record selected in input table.')
-    if selection_count(out_table) < 1:
-        raise Exception('No output record(s) selected.')
-    if selection_count(out_table) > max_selection:
-        raise Exception('Number of records selected in out table exceeds max_out_selection.')
-    if len(in_fields) != len(out_fields):
-        raise Exception(f'Cannot match fields one-to-one, a different number of fields was specified for input and output.\n Input: {len(in_fields)}, Output: {len(in_fields)}.')
-
-    for index in enumerate(in_fields):
-        #Get Value from in_table with SearchCursor
-        with arcpy.da.SearchCursor(in_table, in_fields[index]) as search_cursor:
-            in_row = next(search_cursor)
-            in_val = in_row[0]
-
-        ##Update Values in out_table with Update Cursor
-        with arcpy.da.UpdateCursor(out_table, out_fields[index]) as update_cursor:
-            for out_row in update_cursor:
-                out_row[0] = in_val
-                update_cursor.updateRow(out_row)
-                
-    #Reset Selection
-    if reset_selection == True:
-        arcpy.management.SelectLayerByAttribute(in_layer_or_view = in_table, selection_type = "CLEAR_SELECTION", where_clause = "", invert_where_clause = None)
-        arcpy.management.SelectLayerByAttribute(in_layer_or_view = out_table, selection_type = "CLEAR_SELECTION", where_clause = "", invert_where_clause = None)
-        
-def replace_attributes(table, fields = list|str, replace_value = None, reset_selection: bool = True, max_selection: int = 1) -> None:
+    with EditSession(backend, reset_selection) as session:
+        session.transfer(in_table, out_table, in_fields, out_fields, max_selection)
+
+def replace_attributes(table, fields = list|str, replace_value = None, reset_selection: bool = True, max_selection: int = 1, backend: TableBackend = None) -> None:
     '''
-    Replaces (or clears as <Null>) selected records in a table.
+    Replaces (or clears as <Null>) selected records in a table. All fields are updated in a single UpdateCursor pass.
+    To make several edits at once, use an `EditSession`.
     `table`: Input table to copy records from.
     `fields`: List of fields in the table to replace attributes of. A string can also be used for a single field.
     `replace_value`: Value to replace attributes with. By default attributes are set to <Null> (equivalent to Pythonic `None`).
@@ -69,25 +211,12 @@ def replace_attributes(table, fields = list|str, replace_value = None, reset_sel
     reset_selection`: If the current selection should be reset after transferring attributes.
         Default: `True`
     `max_selection`: Maximum number of records that can be selected in the table.
-        Default: `1` 
+        Default: `1`
+    `backend`: `TableBackend` used to access the table.
+        Default: `None`, `table_backend.get_backend()`
     '''
-    #Check Selection Count
-    if selection_count(table) < 1:
-        raise Exception('No output record(s) selected.')
-    if selection_count(table) > max_selection:
-        raise Exception('Number of records selected in table exceeds max_selection.')
-    
-    #Update Fields
-    if isinstance(fields,str):
-        fields = list(fields)
-    codeblock = f"""def return_val():
-        return {replace_value}"""
-    for field in fields:
-        arcpy.management.CalculateField(in_table = table, field = field, expression = 'return_val()', code_block = codeblock)
-    
-    #Reset Selection
-    if reset_selection is True:
-        arcpy.management.SelectLayerByAttribute(in_layer_or_view = table, selection_type = "CLEAR_SELECTION", where_clause = "", invert_where_clause = None)
+    with EditSession(backend, reset_selection) as session:
+        session.replace(table, fields, replace_value, max_selection)
 
 def select_first_record(table, id_field: str = 'OBJECTID'):
     '''